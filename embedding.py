@@ -1,60 +1,89 @@
 import json
+import logging
 import os
 import boto3
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Union
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+log = logging.getLogger(__name__)
+
+# orjson is much faster than the stdlib json module for request/response payloads
+try:
+    import orjson
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:
+    _json_dumps = json.dumps
+    _json_loads = json.loads
+
 
 class BedrockEmbedding:
     """Amazon Bedrock embedding client for Titan Embed Text v2"""
     
-    def __init__(self, region_name: str = None):
+    def __init__(self, region_name: str = None, max_parallel_api_rate: int = None, client=None):
         self.region_name = region_name or os.environ.get("AWS_DEFAULT_REGION", "us-east-1")
         self.model_id = "amazon.titan-embed-text-v2:0"
+        # Maximum number of InvokeModel requests in flight for one list input
+        self.max_parallel_api_rate = max_parallel_api_rate or int(os.environ.get("EMBED_MAX_PARALLEL", "16"))
         
-        self.bedrock_client = boto3.client(
+        # A shared bedrock-runtime client can be passed in so its connection pool is reused
+        self.bedrock_client = client or boto3.client(
             service_name='bedrock-runtime',
-            region_name=self.region_name
+            region_name=self.region_name,
+            config=Config(max_pool_connections=self.max_parallel_api_rate)
         )
+        # Worker threads are only started on the first batch, so creating the pool here is cheap
+        self._executor = ThreadPoolExecutor(max_workers=self.max_parallel_api_rate)
     
-    def embed_text(self, text: Union[str, List[str]], dimensions: int = 1024, normalize: bool = True):
-        """Create embeddings using Amazon Titan Embed Text v2"""
+    def embed_text(self, text: Union[str, List[str]], dimensions: int = 1024, normalize: bool = True,
+                   raise_errors: bool = False):
+        """
+        Create embeddings using Amazon Titan Embed Text v2
+        
+        Failed requests yield zero vectors unless raise_errors is set, in which
+        case the first error is raised.
+        """
+        embed_one = self._invoke if raise_errors else self._embed_one
         if isinstance(text, str):
-            texts = [text]
-            single_input = True
-        else:
-            texts = text
-            single_input = False
+            return embed_one(text, dimensions, normalize)
         
-        embeddings = []
+        texts = list(text)
+        if len(texts) <= 1:
+            return [embed_one(text_item, dimensions, normalize) for text_item in texts]
         
-        for text_item in texts:
-            try:
-                body = {
-                    "inputText": text_item,
-                    "dimensions": dimensions,
-                    "normalize": normalize
-                }
-                
-                response = self.bedrock_client.invoke_model(
-                    modelId=self.model_id,
-                    body=json.dumps(body),
-                    contentType='application/json',
-                    accept='application/json'
-                )
-                
-                response_body = json.loads(response['body'].read())
-                embedding = response_body.get('embedding', [])
-                embeddings.append(embedding)
-                
-            except ClientError as e:
-                print(f"Error creating embedding: {e}")
-                embeddings.append([0.0] * dimensions)
+        # Titan has no batch endpoint, so fan the requests out over a thread pool
+        return list(self._executor.map(
+            lambda text_item: embed_one(text_item, dimensions, normalize),
+            texts
+        ))
+    
+    def _embed_one(self, text_item: str, dimensions: int, normalize: bool):
+        """Create the embedding for a single text"""
+        try:
+            return self._invoke(text_item, dimensions, normalize)
+        except ClientError as e:
+            log.warning("Error creating embedding: %s", e)
+            return [0.0] * dimensions
+    
+    def _invoke(self, text_item: str, dimensions: int, normalize: bool):
+        """Call InvokeModel for a single text, letting errors propagate"""
+        body = {
+            "inputText": text_item,
+            "dimensions": dimensions,
+            "normalize": normalize
+        }
         
-        if single_input:
-            return embeddings[0]
+        response = self.bedrock_client.invoke_model(
+            modelId=self.model_id,
+            body=_json_dumps(body),
+            contentType='application/json',
+            accept='application/json'
+        )
         
-        return embeddings
+        response_body = _json_loads(response['body'].read())
+        return response_body.get('embedding', [])
 
 
 def create_embeddings(texts: Union[str, List[str]], region_name: str = None, **kwargs):
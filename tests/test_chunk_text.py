@@ -0,0 +1,23 @@
+import pytest
+
+from utils_strand import chunk_text_by_tokens
+
+TEXTS = [
+    "",
+    "Zeus is the king of the gods.",
+    "제우스는 올림포스의 신들의 왕이자 하늘과 천둥의 신이다. " * 20,
+    "혼합된 text with 한국어, emoji 😀🎉 and accents é à ü. " * 15,
+]
+
+
+@pytest.mark.parametrize("text", TEXTS)
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 50])
+def test_non_overlapping_windows_round_trip(text, chunk_size):
+    chunks = chunk_text_by_tokens(text, chunk_size, stride=chunk_size)
+    assert "".join(chunks) == text
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_windows_never_split_characters(text):
+    for chunk in chunk_text_by_tokens(text, 5):
+        assert "�" not in chunk
@@ -0,0 +1,72 @@
+import pytest
+
+from tools import parse_extraction_output
+
+
+def _split_strip_parse(output_str, record_delimiter=None, tuple_delimiter=None):
+    """The split/strip parser parse_extraction_output replaced, kept as the reference"""
+    output_str = output_str.replace("{completion_delimiter}", "").strip()
+    if record_delimiter is None:
+        if "{record_delimiter}" in output_str:
+            record_delimiter = "{record_delimiter}"
+        elif "|" in output_str:
+            record_delimiter = "|"
+        else:
+            record_delimiter = "\n"
+    if tuple_delimiter is None:
+        if "{tuple_delimiter}" in output_str:
+            tuple_delimiter = "{tuple_delimiter}"
+        elif ";" in output_str:
+            tuple_delimiter = ";"
+        else:
+            tuple_delimiter = "\t"
+
+    nodes, relationships = [], []
+    for rec in (r.strip() for r in output_str.split(record_delimiter)):
+        if not rec:
+            continue
+        if rec.startswith("(") and rec.endswith(")"):
+            rec = rec[1:-1]
+        tokens = [token.strip() for token in rec.strip().split(tuple_delimiter)]
+        rec_type = tokens[0].strip(' "\'').lower()
+        if rec_type == "entity" and len(tokens) == 4:
+            nodes.append({"record_type": "entity", "entity_name": tokens[1],
+                          "entity_type": tokens[2], "entity_description": tokens[3]})
+        elif rec_type == "relationship" and len(tokens) == 5:
+            try:
+                strength = float(tokens[4])
+                if strength.is_integer():
+                    strength = int(strength)
+            except ValueError:
+                strength = tokens[4]
+            relationships.append({"record_type": "relationship", "source_entity": tokens[1],
+                                  "target_entity": tokens[2], "relationship_description": tokens[3],
+                                  "relationship_strength": strength})
+    return nodes, relationships
+
+
+@pytest.mark.parametrize("output", [
+    # NBSP and the ideographic space around fields, common in Korean/CJK output
+    '("entity";ZEUS\xa0;PERSON;King of the gods)',
+    '("entity";　제우스　;PERSON　;올림포스의 왕)|("relationship";제우스\xa0;헤라;부부;9　)',
+    '(　"entity"\xa0;ZEUS;PERSON;desc)　|\xa0("relationship";ZEUS;HERA;married;8)',
+    # Stacked and mixed quotes around the record type
+    '(""entity";ZEUS;PERSON;desc)',
+    '(\'"entity"\';ZEUS;PERSON;desc)|(" "relationship"";ZEUS;HERA;married;7.5)',
+    # Whitespace that is not stripped before the quotes is not a match
+    '("entity\xa0";ZEUS;PERSON;desc)',
+    # Tab fallback delimiter with whitespace at the record edges
+    '("entity"\tZEUS\tPERSON\tdesc\t)\n("relationship"\tZEUS\tHERA\t　married\t3)',
+    # Only ASCII case folding of the record type
+    '("ENTITY";ZEUS;PERSON;desc)|("relationſhip";ZEUS;HERA;married;1)',
+])
+def test_matches_split_strip_parser(output):
+    assert parse_extraction_output(output) == _split_strip_parse(output)
+
+
+def test_unicode_whitespace_is_stripped():
+    nodes, relationships = parse_extraction_output(
+        '("entity";ZEUS\xa0;PERSON;desc)|("relationship";　ZEUS;HERA;married;9)'
+    )
+    assert [node["entity_name"] for node in nodes] == ["ZEUS"]
+    assert relationships[0]["source_entity"] == "ZEUS"
@@ -1,29 +1,131 @@
+import asyncio
+import atexit
+import hashlib
 import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
 import re
-from typing import List, Dict, Any, Optional
+import sqlite3
+import string
+import threading
+import time
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from functools import lru_cache
+from itertools import islice
+from tqdm import tqdm
+from typing import List, Dict, Any, Optional, Iterable, Iterator
+
+log = logging.getLogger(__name__)
+
+
+def setup_logging(level: Optional[str] = None):
+    """
+    Show tools' progress messages, writing them from a background thread
+    
+    Call once from a notebook or script. Records go through a QueueHandler on
+    the root logger and a QueueListener thread formats and writes them, so the
+    pipeline loops only pay for a queue put. Like logging.basicConfig, this
+    does nothing if the application already configured the root logger,
+    unless level is given.
+    
+    Args:
+        level: Level of the tools logger (default: TOOLS_LOG_LEVEL or INFO);
+            DEBUG also shows per-chunk messages
+    """
+    root = logging.getLogger()
+    if level is not None or not root.handlers:
+        log.setLevel((level or os.environ.get("TOOLS_LOG_LEVEL", "INFO")).upper())
+    if root.handlers:
+        return
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    atexit.register(listener.stop)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+# orjson parses LLM JSON output several times faster than the stdlib json module;
+# its JSONDecodeError subclasses json.JSONDecodeError, so except clauses are shared
+try:
+    import orjson
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+except ImportError:
+    _json_loads = json.loads
+    _json_dumps = json.dumps
 
-# Import utilities from utils_strand
+# Numba JIT-compiles the union-find kernel; without it the kernel runs as plain Python
 try:
-    from utils_strand import (
-        neo4j_driver, 
-        chat, 
-        chat_bedrock, 
-        embed, 
-        embed_bedrock, 
-        embed_openai,
-        test_neo4j_connection,
-        test_all_connections,
-        STRANDS_AVAILABLE,
-        OPENAI_AVAILABLE,
-        num_tokens_from_string,
-        chunk_text
-    )
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
+# xxhash fingerprints chunk texts much faster than hashlib; blake2b is the fallback
+try:
+    import xxhash
+
+    def _chunk_digest(data):
+        return xxhash.xxh3_64_hexdigest(data)
+except ImportError:
+    def _chunk_digest(data):
+        return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+# neo4j.Query lets a query text be built once and carry metadata; plain strings work without it
+try:
+    from neo4j import Query, Result
+except ImportError:
+    Result = None
+
+    def Query(text, metadata=None, timeout=None):
+        return text
+
+# Deadlocks and other retryable server errors are all TransientError subclasses/codes
+try:
+    from neo4j.exceptions import CypherSyntaxError, TransientError
+except ImportError:
+    class TransientError(Exception):
+        pass
+
+    class CypherSyntaxError(Exception):
+        code = None
+
+# Import utilities from utils_strand; its __all__ lists the names re-exported from here
+try:
+    import utils_strand
+    from utils_strand import *
     UTILS_AVAILABLE = True
 except ImportError as e:
-    print(f"Warning: Could not import from utils_strand: {e}")
-    print("Some functionality may be limited.")
+    log.warning("Could not import from utils_strand: %s. Some functionality may be limited.", e)
     UTILS_AVAILABLE = False
+    _UTILS_IMPORT_ERROR = e
+    # Read by this module's own functions, so they must exist as globals
     neo4j_driver = None
+    NEO4J_DATABASE = None
+    STRANDS_AVAILABLE = False
+    OPENAI_AVAILABLE = False
+
+
+def __getattr__(name):
+    """Report utils_strand names as unavailable, when it failed to import, on first access (PEP 562)"""
+    if not UTILS_AVAILABLE and not name.startswith("__"):
+        raise RuntimeError(f"{name} is not available: utils_strand could not be imported ({_UTILS_IMPORT_ERROR})")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 GRAPH_EXTRACTION_PROMPT = """-Goal-
 Given a text document that is potentially relevant to this activity and a list of entity types, identify all entities of those types from the text and all relationships among the identified entities.
@@ -146,7 +248,18 @@ Text: {input_text}
 ######################
 Output:"""
 
+# Delimiters are fixed, so substitute them once; only entity_types/input_text vary per call.
+# The template has no escaped braces, so plain replace() matches .format() exactly.
+_PROMPT_PARTIAL = (
+    GRAPH_EXTRACTION_PROMPT
+    .replace("{tuple_delimiter}", ";")
+    .replace("{record_delimiter}", "|")
+    .replace("{completion_delimiter}", "\n\n")
+)
+
 def create_extraction_prompt(entity_types, input_text, tuple_delimiter=";"):
+    if tuple_delimiter == ";":
+        return _PROMPT_PARTIAL.format(entity_types=entity_types, input_text=input_text)
     prompt = GRAPH_EXTRACTION_PROMPT.format(
         entity_types=entity_types,
         input_text=input_text,
@@ -156,6 +269,102 @@ def create_extraction_prompt(entity_types, input_text, tuple_delimiter=";"):
     )
     return prompt
 
+# Multi-passage variant: the instructions and examples are shared, the passages are
+# numbered and the model answers each under its own marker line
+_BATCH_PROMPT_HEADER = _PROMPT_PARTIAL[:_PROMPT_PARTIAL.index("-Real Data-")]
+_BATCH_PROMPT_DATA = """-Real Data-
+######################
+Entity_types: {entity_types}
+The text below contains {n} passages, each introduced by a "#PASSAGE <i>#" line.
+Apply the steps above to each passage separately. For each passage, output its "#PASSAGE <i>#" line
+followed by the entities and relationships of that passage only, in passage order.
+{passages}
+######################
+Output:"""
+_PASSAGE_MARKER_RE = re.compile(r"#PASSAGE (\d+)#")
+
+
+def create_batch_extraction_prompt(entity_types, input_texts):
+    """Build one extraction prompt covering several passages"""
+    passages = "\n".join(f"#PASSAGE {i}#\n{text}" for i, text in enumerate(input_texts, 1))
+    return _BATCH_PROMPT_HEADER.format(entity_types=entity_types) + _BATCH_PROMPT_DATA.format(
+        entity_types=entity_types, n=len(input_texts), passages=passages
+    )
+
+
+def split_batch_extraction_output(output_str, n):
+    """
+    Split a multi-passage extraction response into per-passage record strings
+    
+    Args:
+        output_str: Model response to a create_batch_extraction_prompt prompt
+        n: Number of passages in the prompt
+    
+    Returns:
+        List of n strings, one per passage, or None if the markers do not
+        number exactly 1..n in order
+    """
+    parts = _PASSAGE_MARKER_RE.split(output_str)
+    # parts = [preamble, "1", section, "2", section, ...]
+    if [int(number) for number in parts[1::2]] != list(range(1, n + 1)):
+        return None
+    return parts[2::2]
+
+
+def _prepare_extraction_output(output_str, record_delimiter, tuple_delimiter):
+    """Normalize the output string and pick the record patterns for its delimiters"""
+    # Convert AgentResult to string if needed
+    if hasattr(output_str, 'text'):
+        output_str = output_str.text
+    elif hasattr(output_str, 'content'):
+        output_str = output_str.content
+    elif not isinstance(output_str, str):
+        output_str = str(output_str)
+    
+    # All placeholder markers start with "{"; one memchr scan tells whether any can be present
+    # so the common placeholder-free output skips the full-length substring searches below.
+    has_placeholders = "{" in output_str
+
+    # Remove the completion delimiter if present.
+    if has_placeholders:
+        output_str = output_str.replace("{completion_delimiter}", "")
+    output_str = output_str.strip()
+
+    # Determine the record delimiter if not provided.
+    if record_delimiter is None:
+        if has_placeholders and "{record_delimiter}" in output_str:
+            record_delimiter = "{record_delimiter}"
+        elif "|" in output_str:
+            record_delimiter = "|"
+        else:
+            # Fallback: split on newlines
+            record_delimiter = "\n"
+
+    # Determine the tuple delimiter if not provided.
+    if tuple_delimiter is None:
+        if has_placeholders and "{tuple_delimiter}" in output_str:
+            tuple_delimiter = "{tuple_delimiter}"
+        elif ";" in output_str:
+            tuple_delimiter = ";"
+        else:
+            tuple_delimiter = "\t"
+
+    entity_re, relationship_re = _record_patterns(record_delimiter, tuple_delimiter)
+    return output_str, entity_re, relationship_re
+
+
+def _parse_strength(strength):
+    """Convert relationship_strength to a number where possible"""
+    try:
+        strength = float(strength)
+        # Convert to int if it has no fractional part.
+        if strength.is_integer():
+            strength = int(strength)
+    except ValueError:
+        pass
+    return strength
+
+
 def parse_extraction_output(output_str, record_delimiter=None, tuple_delimiter=None):
     """
     Parse a structured output string containing "entity" and "relationship" records into a list of dictionaries.
@@ -196,97 +405,141 @@ def parse_extraction_output(output_str, record_delimiter=None, tuple_delimiter=N
             - relationship_description
             - relationship_strength (as an int or float)
     """
-    # Convert AgentResult to string if needed
-    if hasattr(output_str, 'text'):
-        output_str = output_str.text
-    elif hasattr(output_str, 'content'):
-        output_str = output_str.content
-    elif not isinstance(output_str, str):
-        output_str = str(output_str)
-    
-    # Remove the completion delimiter if present.
-    completion_marker = "{completion_delimiter}"
-    if completion_marker in output_str:
-        output_str = output_str.replace(completion_marker, "")
-    output_str = output_str.strip()
+    output_str, entity_re, relationship_re = _prepare_extraction_output(
+        output_str, record_delimiter, tuple_delimiter
+    )
 
-    # Determine the record delimiter if not provided.
-    if record_delimiter is None:
-        if "{record_delimiter}" in output_str:
-            record_delimiter = "{record_delimiter}"
-        elif "|" in output_str:
-            record_delimiter = "|"
-        else:
-            # Fallback: split on newlines
-            record_delimiter = "\n"
+    # Build each bucket in a single pass straight from the match groups
+    nodes = [
+        {
+            "record_type": "entity",
+            "entity_name": name,
+            "entity_type": entity_type,
+            "entity_description": description
+        }
+        for _, name, entity_type, description in map(_match_groups, entity_re.finditer(output_str))
+    ]
 
-    # Determine the tuple delimiter if not provided.
-    if tuple_delimiter is None:
-        if "{tuple_delimiter}" in output_str:
-            tuple_delimiter = "{tuple_delimiter}"
-        elif ";" in output_str:
-            tuple_delimiter = ";"
-        else:
-            tuple_delimiter = "\t"
+    relationships = [
+        {
+            "record_type": "relationship",
+            "source_entity": source,
+            "target_entity": target,
+            "relationship_description": description,
+            "relationship_strength": _parse_strength(strength)
+        }
+        for _, source, target, description, strength in map(_match_groups, relationship_re.finditer(output_str))
+    ]
+    return nodes, relationships
 
-    # Split the output into individual record strings.
-    raw_records = [r.strip() for r in output_str.split(record_delimiter)]
 
-    parsed_records = []
-    for rec in raw_records:
-        if not rec:
-            continue  # skip empty strings
+@dataclass(slots=True)
+class Entity:
+    """One extracted "entity" record"""
+    entity_name: str
+    entity_type: str
+    entity_description: str
+    
+    def as_dict(self) -> Dict:
+        """The dict shape parse_extraction_output returns"""
+        return {"record_type": "entity", "entity_name": self.entity_name,
+                "entity_type": self.entity_type, "entity_description": self.entity_description}
 
-        # Remove leading/trailing parentheses if present.
-        if rec.startswith("(") and rec.endswith(")"):
-            rec = rec[1:-1]
-        rec = rec.strip()
 
-        # Split the record into tokens using the tuple delimiter.
-        tokens = [token.strip() for token in rec.split(tuple_delimiter)]
-        if not tokens:
-            continue
+@dataclass(slots=True)
+class Relationship:
+    """One extracted "relationship" record"""
+    source_entity: str
+    target_entity: str
+    relationship_description: str
+    relationship_strength: Any
+    
+    def as_dict(self) -> Dict:
+        """The dict shape parse_extraction_output returns"""
+        return {"record_type": "relationship", "source_entity": self.source_entity,
+                "target_entity": self.target_entity,
+                "relationship_description": self.relationship_description,
+                "relationship_strength": self.relationship_strength}
 
-        # The first token should be either "entity" or "relationship".
-        rec_type = tokens[0].strip(' "\'').lower()
 
-        if rec_type == "entity":
-            if len(tokens) != 4:
-                # Optionally log or raise an error for malformed records.
-                continue
-            record = {
-                "record_type": "entity",
-                "entity_name": tokens[1],
-                "entity_type": tokens[2],
-                "entity_description": tokens[3]
-            }
-            parsed_records.append(record)
-        elif rec_type == "relationship":
-            if len(tokens) != 5:
-                continue
-            # Attempt to convert relationship_strength to a number.
-            try:
-                strength = float(tokens[4])
-                # Convert to int if it has no fractional part.
-                if strength.is_integer():
-                    strength = int(strength)
-            except ValueError:
-                strength = tokens[4]
-            record = {
-                "record_type": "relationship",
-                "source_entity": tokens[1],
-                "target_entity": tokens[2],
-                "relationship_description": tokens[3],
-                "relationship_strength": strength
-            }
-            parsed_records.append(record)
-        else:
-            # Unknown record type; skip it or handle accordingly.
-            continue
-    nodes = [el for el in parsed_records if el.get("record_type") == "entity"]
-    relationships = [el for el in parsed_records if el.get("record_type") == "relationship"]
+def parse_extraction_records(output_str, record_delimiter=None, tuple_delimiter=None) -> tuple:
+    """
+    Parse extraction output like parse_extraction_output, into slotted records
+    
+    Entity and Relationship instances take far less memory than the
+    equivalent dicts when many chunks are held at once; the import functions
+    accept them in place of dicts and convert only when sending to Neo4j.
+    
+    Returns:
+        Tuple of (List[Entity], List[Relationship])
+    """
+    output_str, entity_re, relationship_re = _prepare_extraction_output(
+        output_str, record_delimiter, tuple_delimiter
+    )
+    nodes = [Entity(name, entity_type, description)
+             for _, name, entity_type, description in map(_match_groups, entity_re.finditer(output_str))]
+    relationships = [
+        Relationship(source, target, description, _parse_strength(strength))
+        for _, source, target, description, strength in map(_match_groups, relationship_re.finditer(output_str))
+    ]
     return nodes, relationships
 
+
+_match_groups = re.Match.groups
+
+
+@lru_cache(maxsize=16)
+def _record_patterns(record_delimiter, tuple_delimiter):
+    """
+    Compile the entity and relationship record patterns for a pair of delimiters.
+
+    A record starts at the beginning of the output or right after a record
+    delimiter, may be wrapped in a pair of parentheses, and must have exactly the
+    expected number of fields. Fields never contain either delimiter and are
+    captured without surrounding whitespace.
+
+    The patterns accept exactly what the split/strip parser did: whitespace is
+    anything str.strip() removes (including NBSP and the ideographic space),
+    and the record type may be wrapped in any run of quotes and spaces, as
+    str.strip(' "\'') allowed.
+    """
+    rec = re.escape(record_delimiter)
+    sep = re.escape(tuple_delimiter)
+    field = rf"((?:(?!{sep}|{rec}).)*?)"
+    delimiters = tuple_delimiter + record_delimiter
+
+    def ws_except(chars):
+        # Unicode whitespace that is not itself part of a delimiter (e.g. the tab fallback)
+        return rf"[^\S{re.escape(''.join(sorted({c for c in chars if c.isspace()})))}]*"
+
+    # Records were stripped whole before being split into fields, so their edges
+    # may hold a whitespace tuple delimiter; between fields it must be left alone
+    edge = ws_except(record_delimiter)
+    ws = ws_except(delimiters)
+    if tuple_delimiter.isspace():
+        # ...and a whitespace delimiter among the trailing whitespace was stripped, not split on
+        sep += rf"(?!{edge}(?(open)\)){edge}(?:{rec}|\Z))"
+    quotes = "".join(c for c in ' "\'' if c not in delimiters)
+    quote_run = rf"[{re.escape(quotes)}]*" if quotes else ""
+
+    def record(kind, n_fields):
+        fields = rf"{ws}{sep}{ws}".join([field] * n_fields)
+        # ASCII case folding only, like str.lower() == kind (re's (?i) would also accept e.g. U+017F for "s")
+        kind_re = "".join(f"[{c}{c.upper()}]" for c in kind)
+        return re.compile(
+            rf"(?:\A|(?<={rec})){edge}(?P<open>\()?{edge}{quote_run}{kind_re}{quote_run}{ws}{sep}{ws}"
+            rf"{fields}{edge}(?(open)\)){edge}(?={rec}|\Z)",
+            re.DOTALL,
+        )
+
+    return record("entity", 3), record("relationship", 4)
+
+
+# Compile the patterns for the delimiters create_extraction_prompt asks for up front
+# (and those of the "{...}" placeholder form), so no parse call pays for compilation
+_record_patterns("|", ";")
+_record_patterns("{record_delimiter}", "{tuple_delimiter}")
+
 import_nodes_query = """
 MERGE (b:Book {id: $book_id})
 MERGE (b)-[:HAS_CHUNK]->(c:__Chunk__ {id: $chunk_id})
@@ -299,6 +552,8 @@ SET n:$(row.entity_type),
 MERGE (n)<-[:MENTIONS]-(c)
 """
 
+# Endpoints are MERGEd so the query also works on its own (the notebooks run it
+# directly); the fused chunk import MATCHes them after creating them via $endpoints
 import_relationships_query = """
 UNWIND $data AS row
 MERGE (s:__Entity__ {name: row.source_entity})
@@ -306,6 +561,153 @@ MERGE (t:__Entity__ {name: row.target_entity})
 CREATE (s)-[r:RELATIONSHIP {description: row.relationship_description, strength: row.relationship_strength}]->(t)
 """
 
+_IMPORT_CHUNK_TEMPLATE = """
+MERGE (b:Book {{id: $book_id}})
+MERGE (b)-[:HAS_CHUNK]->(c:__Chunk__ {{id: $chunk_id}})
+SET c.text = $text
+WITH c
+CALL (c) {{
+  UNWIND range(0, size($names) - 1) AS i
+  MERGE (n:__Entity__ {{name: $names[i]}})
+  SET n.description = coalesce(n.description, []) + $descs[i]{label_clauses}
+  MERGE (n)<-[:MENTIONS]-(c)
+}}
+CALL () {{
+  UNWIND $endpoints AS name
+  MERGE (:__Entity__ {{name: name}})
+}}
+CALL () {{
+  UNWIND $rels AS row
+  MATCH (s:__Entity__ {{name: row.source_entity}})
+  MATCH (t:__Entity__ {{name: row.target_entity}})
+  CREATE (s)-[r:RELATIONSHIP {{description: row.relationship_description, strength: row.relationship_strength}}]->(t)
+}}
+"""
+
+
+# The same write for many chunks at once: one row of $batch per chunk, each row
+# carrying the columnar fields of _IMPORT_CHUNK_TEMPLATE
+_IMPORT_BATCH_TEMPLATE = """
+UNWIND $batch AS row
+MERGE (b:Book {{id: row.book_id}})
+MERGE (b)-[:HAS_CHUNK]->(c:__Chunk__ {{id: row.chunk_id}})
+SET c.text = row.text
+WITH row, c
+CALL (row, c) {{
+  UNWIND range(0, size(row.names) - 1) AS i
+  MERGE (n:__Entity__ {{name: row.names[i]}})
+  SET n.description = coalesce(n.description, []) + row.descs[i]{label_clauses}
+  MERGE (n)<-[:MENTIONS]-(c)
+}}
+CALL (row) {{
+  UNWIND row.endpoints AS name
+  MERGE (:__Entity__ {{name: name}})
+}}
+CALL (row) {{
+  UNWIND row.rels AS rel
+  MATCH (s:__Entity__ {{name: rel.source_entity}})
+  MATCH (t:__Entity__ {{name: rel.target_entity}})
+  CREATE (s)-[r:RELATIONSHIP {{description: rel.relationship_description, strength: rel.relationship_strength}}]->(t)
+}}
+"""
+
+
+def _label_clauses(entity_types, types_expr):
+    return "".join(
+        "\n  FOREACH (_ IN CASE WHEN '{value}' IN {types_expr}[i] THEN [1] ELSE [] END | SET n:`{label}`)".format(
+            value=entity_type.replace("\\", "\\\\").replace("'", "\\'"),
+            types_expr=types_expr,
+            label=entity_type.replace("`", "``"),
+        )
+        for entity_type in entity_types
+    )
+
+
+@lru_cache(maxsize=64)
+def _build_import_queries(entity_types):
+    return (
+        _IMPORT_CHUNK_TEMPLATE.format(label_clauses=_label_clauses(entity_types, "$types")),
+        _IMPORT_BATCH_TEMPLATE.format(label_clauses=_label_clauses(entity_types, "row.types")),
+    )
+
+
+def build_import_queries(entity_types) -> tuple:
+    """
+    Generate the chunk import queries specialized for a set of entity types
+    
+    Each type gets a fixed-label SET and every property is set explicitly, so
+    the whole chunk (entities, labels and relationships) is written in one
+    statement with no dynamic labels or map expansion, and the server reuses
+    one cached plan per schema. Queries are cached per distinct set of types.
+    
+    Args:
+        entity_types: Entity type labels that may occur in the types lists
+    
+    Returns:
+        (chunk query, batch query): the chunk query takes $book_id, $chunk_id,
+        $text, the columnar entity lists $names (unique), $types and $descs
+        (a list per name), $endpoints and $rels; the batch query takes $batch,
+        a list of rows with those same fields
+    """
+    return _build_import_queries(tuple(sorted(set(entity_types))))
+
+
+def build_import_nodes_query(entity_types) -> str:
+    """Return the single-chunk query of build_import_queries"""
+    return build_import_queries(entity_types)[0]
+
+
+# The unspecialized form: entities and relationships without type labels
+import_chunk_query = build_import_nodes_query(())
+
+
+def _chunk_row(book_id, chunk_id, text, nodes, rels):
+    """Build the columnar parameters for one chunk's import"""
+    # Typed records from parse_extraction_records become dicts only here, at the driver boundary
+    nodes = [node.as_dict() if isinstance(node, Entity) else node for node in nodes]
+    rels = [rel.as_dict() if isinstance(rel, Relationship) else rel for rel in rels]
+    # One row per distinct entity name: its types and every description from this chunk
+    grouped = {}
+    for node in nodes:
+        entity_types, entity_descs = grouped.setdefault(node["entity_name"], ([], []))
+        if node["entity_type"] and node["entity_type"] not in entity_types:
+            entity_types.append(node["entity_type"])
+        entity_descs.append(node["entity_description"])
+    names = list(grouped)
+    # Relationship endpoints that are not extracted entities are merged once per distinct name,
+    # so the relationship rows themselves only need index lookups
+    endpoints = {rel["source_entity"] for rel in rels} | {rel["target_entity"] for rel in rels}
+    endpoints.difference_update(names)
+    return {
+        "book_id": book_id,
+        "chunk_id": chunk_id,
+        "text": text,
+        "names": names,
+        "types": [entity_types for entity_types, _ in grouped.values()],
+        "descs": [entity_descs for _, entity_descs in grouped.values()],
+        "endpoints": list(endpoints),
+        "rels": rels,
+    }
+
+
+def _row_types(row):
+    return (entity_type for entity_types in row["types"] for entity_type in entity_types)
+
+
+def _import_chunk(tx, book_id, chunk_id, text, nodes, rels):
+    """Write one chunk's entities, type labels and relationships in a single statement"""
+    row = _chunk_row(book_id, chunk_id, text, nodes, rels)
+    query = build_import_nodes_query(_row_types(row))
+    tx.run(query, **row).consume()
+
+
+def _import_batch(tx, chunks):
+    """Write many chunks, given as (book_id, chunk_id, text, nodes, rels) tuples, in a single statement"""
+    batch = [_chunk_row(*chunk) for chunk in chunks]
+    _, query = build_import_queries(entity_type for row in batch for entity_type in _row_types(row))
+    tx.run(query, batch=batch).consume()
+
+
 SUMMARIZE_PROMPT = """
 You are a helpful assistant responsible for generating a comprehensive summary of the data provided below.
 Given one or two entities, and a list of descriptions, all related to the same entity or group of entities.
@@ -326,98 +728,303 @@ def get_summarize_prompt(entity_name, description_list):
         entity_name=entity_name,
         description_list=description_list)
 
-def calculate_communities(driver=None):
+# One row per (entity, neighbour) pair, streamed instead of collected per entity
+# Adjacency is read in shards of the entity name range so the server can expand them in parallel
+COMMUNITY_EDGE_SHARDS = int(os.environ.get("COMMUNITY_EDGE_SHARDS", "4"))
+
+# $k - 1 names splitting the sorted entity names into $k equal ranges
+# (sharding on the stable name instead of the deprecated id() function)
+entity_name_bounds_query = """
+MATCH (e:__Entity__)
+WITH e.name AS name ORDER BY name
+WITH collect(name) AS names
+RETURN [i IN range(1, $k - 1) | names[i * size(names) / $k]] AS bounds
+"""
+
+# Each edge is needed once for union-find, so only outgoing relationships are followed
+entity_edges_query = """
+MATCH (e:__Entity__)
+WHERE ($lo IS NULL OR e.name >= $lo) AND ($hi IS NULL OR e.name < $hi)
+OPTIONAL MATCH (e)-[:RELATIONSHIP]->(c:__Entity__)
+RETURN DISTINCT e.name AS a, c.name AS b
+"""
+
+# Answered from the count store, without transferring any relationships
+relationship_count_query = """
+MATCH ()-[r:RELATIONSHIP]->()
+RETURN count(r) AS c
+"""
+
+# Community writes are split into batches that the server commits in parallel (Neo4j 5.21+)
+set_community_query = """
+UNWIND $data AS row
+CALL (row) {
+  MATCH (e:__Entity__ {name: row.entity})
+  SET e.louvain = row.community
+} IN CONCURRENT TRANSACTIONS OF 10000 ROWS
+"""
+
+# Same write for servers without CALL (row) / CONCURRENT support
+set_community_fallback_query = """
+UNWIND $data AS row
+CALL {
+  WITH row
+  MATCH (e:__Entity__ {name: row.entity})
+  SET e.louvain = row.community
+} IN TRANSACTIONS OF 10000 ROWS
+"""
+
+def _session(driver):
+    """
+    Open a session on the configured database
+    
+    Naming the database saves the round trip that resolves the home database,
+    and sharing execute_query's bookmark manager keeps session and
+    execute_query work causally chained.
+    """
+    return driver.session(database=NEO4J_DATABASE,
+                          bookmark_manager=driver.execute_query_bookmark_manager)
+
+
+# Attempts for writes that fail with a transient error (deadlock, lock timeout, leader switch)
+NEO4J_WRITE_RETRIES = int(os.environ.get("NEO4J_WRITE_RETRIES", "5"))
+
+
+def _retry_transient(fn, *args, retries: int = NEO4J_WRITE_RETRIES, base_delay: float = 0.2, **kwargs):
+    """
+    Call fn, retrying on Neo4j TransientError with exponential backoff and jitter
+    
+    Managed transactions (execute_write/execute_query) already retry inside
+    the driver; this covers auto-commit queries and gives batched writes a
+    further chance before they are split up.
+    """
+    for attempt in range(retries):
+        try:
+            return fn(*args, **kwargs)
+        except TransientError as e:
+            if attempt == retries - 1:
+                raise
+            delay = base_delay * 2 ** attempt * (0.5 + random.random())
+            log.warning("Transient Neo4j error (%s); retrying in %.1fs", e, delay)
+            time.sleep(delay)
+
+
+_constraints_ensured = set()
+
+
+def _range_indexes(driver):
+    """Map (label, property) of every single-property range index to its owning constraint (None if plain)"""
+    rows = driver.execute_query(
+        "SHOW RANGE INDEXES YIELD labelsOrTypes, properties, owningConstraint "
+        "WHERE size(labelsOrTypes) = 1 AND size(properties) = 1 "
+        "RETURN labelsOrTypes[0], properties[0], owningConstraint",
+        database_=NEO4J_DATABASE, result_transformer_=Result.values
+    )
+    return {(label, prop): owner for label, prop, owner in rows}
+
+
+def _create_unique_constraint(driver, indexes, name, label, prop):
+    """
+    Create a uniqueness constraint unless its property is already indexed
+    
+    Graphs set up by the notebooks may hold a plain index on the property,
+    and the server refuses a constraint over an existing index; lookups
+    already use that index, so it is kept and only a warning is logged.
+    """
+    if (label, prop) in indexes:
+        if indexes[(label, prop)] is None:
+            log.warning("Plain index on :%s(%s) exists; not creating constraint %s", label, prop, name)
+        return
+    driver.execute_query(
+        f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE",
+        database_=NEO4J_DATABASE
+    )
+
+
+def ensure_constraints(driver):
+    """
+    Create the schema the import/community queries rely on, once per driver
+    
+    clear_all_graph_data drops every index and constraint, and resets this
+    so the next import re-creates them.
+    """
+    if id(driver) in _constraints_ensured:
+        return
+    indexes = _range_indexes(driver)
+    # Uniqueness constraints are backed by indexes, so MERGE/MATCH on these keys is an index seek
+    _create_unique_constraint(driver, indexes, "entity_name", "__Entity__", "name")
+    _create_unique_constraint(driver, indexes, "community_id", "__Community__", "communityId")
+    _create_unique_constraint(driver, indexes, "book_id", "Book", "id")
+    # Chunk ids restart in every book, so they get a plain index rather than a constraint.
+    # Any existing range index on the property (under another name, or owned by a
+    # constraint the notebooks created) serves the same lookups and would clash.
+    if ("__Chunk__", "id") not in indexes:
+        driver.execute_query(
+            "CREATE INDEX chunk_id IF NOT EXISTS FOR (c:__Chunk__) ON (c.id)",
+            database_=NEO4J_DATABASE
+        )
+    _constraints_ensured.add(id(driver))
+
+
+def _read_edge_shard(driver, lo, hi):
+    """Fetch the entity adjacency for names in [lo, hi) as (a, b) name pairs; None is unbounded"""
+    with _session(driver) as session:
+        return [tuple(values) for values in session.run(_Q_ENTITY_EDGES, lo=lo, hi=hi).values()]
+
+
+def _run_in_transactions(driver, query, fallback_query, **params):
+    """
+    Run a CALL { ... } IN TRANSACTIONS query
+
+    These queries only work in auto-commit transactions, so they go through
+    session.run rather than execute_query. fallback_query is used only when
+    the server rejects the first form as a syntax error (e.g. older Neo4j
+    versions); any other failure is raised.
+    """
+    with _session(driver) as session:
+        try:
+            _retry_transient(lambda: session.run(query, **params).consume())
+        except CypherSyntaxError as e:
+            if e.code != "Neo.ClientError.Statement.SyntaxError":
+                raise
+            log.info("Server does not support this CALL form (%s); using the fallback query", e)
+            _retry_transient(lambda: session.run(fallback_query, **params).consume())
+
+
+@njit(cache=True)
+def _find_root(parent, x):
+    """Find the root of x, halving the path as we go"""
+    while parent[x] != x:
+        parent[x] = parent[parent[x]]
+        x = parent[x]
+    return x
+
+
+@njit(cache=True)
+def _build_components(src, dst, parent, rank):
+    """
+    Union-find over dense entity IDs (union by rank, path halving)
+    
+    Args:
+        src, dst: Edge endpoint IDs
+        parent: Initial parent array (parent[i] == i)
+        rank: Initial rank array (all zeros)
+    
+    Returns:
+        parent, fully compressed so parent[i] is the root of i
+    """
+    for k in range(len(src)):
+        x = _find_root(parent, src[k])
+        y = _find_root(parent, dst[k])
+        if x == y:
+            continue
+        if rank[x] < rank[y]:
+            x, y = y, x
+        parent[y] = x
+        if rank[x] == rank[y]:
+            rank[x] += 1
+    
+    for i in range(len(parent)):
+        parent[i] = _find_root(parent, i)
+    return parent
+
+
+# Touched whenever communities or summaries change; get_community_info caches
+# older than this file are stale. Empty (the default) disables the marker.
+COMMUNITY_VERSION_PATH = os.environ.get("COMMUNITY_VERSION_PATH", "")
+
+
+def _touch_community_version():
+    """Mark cached community info as stale"""
+    if COMMUNITY_VERSION_PATH:
+        Path(COMMUNITY_VERSION_PATH).touch()
+
+
+def calculate_communities(driver=None, shards: int = COMMUNITY_EDGE_SHARDS):
     """Calculate communities using simple connected components algorithm (GDS-free)"""
     if driver is None:
         if not UTILS_AVAILABLE or neo4j_driver is None:
             raise RuntimeError("Neo4j driver not available. Please check utils_strand connection.")
         driver = neo4j_driver
     
-    print("🔍 Calculating communities without GDS...")
-    
-    # 1. 모든 엔티티의 연결 정보 가져오기
-    entities_result = driver.execute_query("""
-    MATCH (e:__Entity__)
-    OPTIONAL MATCH (e)-[r:RELATIONSHIP]-(connected:__Entity__)
-    RETURN e.name as entity, collect(DISTINCT connected.name) as connections
-    """)
-    
-    # 2. Python에서 연결 컴포넌트 계산
-    entities_data = {}
-    all_entities = set()
-    
-    for record in entities_result[0]:
-        entity = record["entity"]
-        connections = [c for c in record["connections"] if c is not None]
-        entities_data[entity] = connections
-        all_entities.add(entity)
-        all_entities.update(connections)
-    
-    # 3. Union-Find 알고리즘으로 연결 컴포넌트 찾기
-    parent = {}
-    
-    def find(x):
-        if x not in parent:
-            parent[x] = x
-        if parent[x] != x:
-            parent[x] = find(parent[x])
-        return parent[x]
-    
-    def union(x, y):
-        px, py = find(x), find(y)
-        if px != py:
-            parent[px] = py
-    
-    # 모든 연결 처리
-    for entity, connections in entities_data.items():
-        for connected in connections:
-            union(entity, connected)
-    
-    # 4. 커뮤니티 그룹핑
-    communities = {}
-    for entity in all_entities:
-        root = find(entity)
-        if root not in communities:
-            communities[root] = []
-        communities[root].append(entity)
-    
-    # 5. 커뮤니티 ID 할당 (크기 순으로 정렬)
-    community_list = sorted(communities.values(), key=len, reverse=True)
-    community_assignment = {}
-    
-    for i, community in enumerate(community_list):
-        for entity in community:
-            community_assignment[entity] = i
-    
-    # 6. Neo4j에 커뮤니티 정보 저장
-    update_data = [{"entity": entity, "community": comm_id} 
-                   for entity, comm_id in community_assignment.items()]
-    
-    driver.execute_query("""
-    UNWIND $data AS row
-    MATCH (e:__Entity__ {name: row.entity})
-    SET e.louvain = row.community
-    """, data=update_data)
-    
-    # 7. 통계 계산
-    community_sizes = [len(comm) for comm in community_list]
-    community_distribution = {}
-    for size in community_sizes:
-        community_distribution[size] = community_distribution.get(size, 0) + 1
+    log.info("🔍 Calculating communities without GDS...")
+    
+    # 1. 엔티티-연결 쌍을 샤드별로 병렬 조회하며 정수 ID 매핑 및 엣지 배열 생성
+    name_to_id = {}
+    edge_src = []
+    edge_dst = []
+    
+    shards = max(1, shards)
+    bounds = driver.execute_query(
+        _Q_ENTITY_NAME_BOUNDS, k=shards, database_=NEO4J_DATABASE, result_transformer_=_single_value
+    ) if shards > 1 else []
+    # Bounds are null when there are no named entities; one unbounded range covers that
+    bounds = [bound for bound in bounds if bound is not None]
+    ranges = list(zip([None] + bounds, bounds + [None]))
+    with ThreadPoolExecutor(max_workers=shards) as executor:
+        futures = [executor.submit(_read_edge_shard, driver, lo, hi) for lo, hi in ranges]
+        # 샤드 순서대로 병합해 실행마다 같은 ID 매핑을 유지
+        for future in futures:
+            for a, b in future.result():
+                entity_id = name_to_id.setdefault(a, len(name_to_id))
+                if b is not None:
+                    edge_src.append(entity_id)
+                    edge_dst.append(name_to_id.setdefault(b, len(name_to_id)))
+    
+    names = list(name_to_id)
+    
+    # 2. Union-Find 알고리즘으로 연결 컴포넌트 찾기
+    n = len(names)
+    if NUMBA_AVAILABLE:
+        parent = _build_components(
+            np.asarray(edge_src, dtype=np.int32),
+            np.asarray(edge_dst, dtype=np.int32),
+            np.arange(n, dtype=np.int32),
+            np.zeros(n, dtype=np.int32),
+        )
+    else:
+        # Plain lists index faster than NumPy arrays in interpreted Python
+        parent = _build_components(edge_src, edge_dst, list(range(n)), [0] * n)
+    
+    # 3. 커뮤니티 그룹핑 및 ID 할당 (크기 순으로 정렬)
+    _, inverse, counts = np.unique(np.asarray(parent), return_inverse=True, return_counts=True)
+    order = np.argsort(-counts, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    community_assignment = rank[inverse]
+    
+    # 4. Neo4j에 커뮤니티 정보 저장
+    update_data = [{"entity": entity, "community": comm_id}
+                   for entity, comm_id in zip(names, community_assignment.tolist())]
+    
+    ensure_constraints(driver)
+    _run_in_transactions(driver, _Q_SET_COMMUNITY, _Q_SET_COMMUNITY_FALLBACK, data=update_data)
+    # 커뮤니티가 바뀌었으므로 get_community_info 캐시 무효화
+    _touch_community_version()
+    
+    # 5. 통계 계산
+    relationship_count = driver.execute_query(
+        _Q_RELATIONSHIP_COUNT, database_=NEO4J_DATABASE, result_transformer_=_single_value
+    )
+    
+    # 크기별 빈도는 bincount 한 번으로 (0이 아닌 bin이 곧 존재하는 크기, 오름차순)
+    size_bins = np.bincount(counts)
+    size_values = np.flatnonzero(size_bins)
+    community_distribution = dict(zip(size_values.tolist(), size_bins[size_values].tolist()))
     
     result = {
-        "communityCount": len(community_list),
+        "communityCount": len(counts),
         "communityDistribution": community_distribution,
-        "nodeCount": len(all_entities),
-        "relationshipCount": sum(len(connections) for connections in entities_data.values()) // 2,
-        "largest_community_size": max(community_sizes) if community_sizes else 0,
-        "smallest_community_size": min(community_sizes) if community_sizes else 0
+        "nodeCount": len(names),
+        "relationshipCount": relationship_count,
+        "largest_community_size": int(size_values[-1]) if len(size_values) else 0,
+        "smallest_community_size": int(size_values[0]) if len(size_values) else 0
     }
     
-    print(f"✅ Found {result['communityCount']} communities")
-    print(f"   - Largest community: {result['largest_community_size']} nodes")
-    print(f"   - Total nodes: {result['nodeCount']}")
-    print(f"   - Total relationships: {result['relationshipCount']}")
+    log.info("✅ Found %s communities", result['communityCount'])
+    log.info("   - Largest community: %s nodes", result['largest_community_size'])
+    log.info("   - Total nodes: %s", result['nodeCount'])
+    log.info("   - Total relationships: %s", result['relationshipCount'])
     
     return result
 
@@ -630,6 +1237,78 @@ id,source,target,description
 JSON만 응답하세요:
 """
 
+_JSON_BLOCK_RE = re.compile(r'```json\s*\n(.*?)\n```', re.DOTALL)
+
+
+_QUOTE, _BACKSLASH = ord('"'), ord('\\')
+
+
+@njit(cache=True)
+def _find_balanced(buf, open_b, close_b):
+    """
+    Return the index just past the bracket matching buf[0], or 0 if it is never closed
+    
+    Same rules as the NumPy path of _balanced_span: brackets between unescaped
+    quotes are ignored.
+    """
+    depth = 0
+    in_string = False
+    backslash_run = 0
+    for i in range(len(buf)):
+        b = buf[i]
+        if b == _BACKSLASH:
+            backslash_run += 1
+            continue
+        if b == _QUOTE:
+            # A quote is escaped when preceded by an odd-length run of backslashes
+            if backslash_run % 2 == 0:
+                in_string = not in_string
+        elif not in_string:
+            if b == open_b:
+                depth += 1
+            elif b == close_b:
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+        backslash_run = 0
+    return 0
+
+
+def _balanced_span(buf, open_b, close_b):
+    """
+    Return the bytes of buf from the first open_b up to its matching close_b
+    
+    Bracket balance is tracked with NumPy prefix sums instead of a per-character
+    loop; brackets inside JSON strings (between unescaped quotes) are ignored.
+    Returns b"" if the bracket is never closed and None if open_b is absent.
+    """
+    start = buf.find(open_b)
+    if start == -1:
+        return None
+    
+    arr = np.frombuffer(buf, dtype=np.uint8, offset=start)
+    
+    if NUMBA_AVAILABLE:
+        # The compiled scanner stops at the match instead of classifying the whole reply
+        return buf[start:start + _find_balanced(arr, open_b, close_b)]
+    
+    # A quote is escaped when preceded by an odd-length run of backslashes
+    positions = np.arange(len(arr))
+    last_plain = np.maximum.accumulate(np.where(arr != _BACKSLASH, positions, -1))
+    backslash_run = np.empty(len(arr), dtype=np.int64)
+    backslash_run[0] = 0
+    backslash_run[1:] = positions[:-1] - last_plain[:-1]
+    quotes = (arr == _QUOTE) & (backslash_run % 2 == 0)
+    in_string = np.cumsum(quotes) % 2 == 1
+    
+    delta = (arr == open_b).astype(np.int64) - (arr == close_b)
+    delta[in_string] = 0
+    closed = np.flatnonzero(np.cumsum(delta) == 0)
+    if len(closed) == 0:
+        return b""
+    return buf[start:start + closed[0] + 1]
+
+
 def extract_json(text):
     """LLM 응답에서 JSON을 안전하게 추출"""
     # Convert AgentResult to string if needed
@@ -643,60 +1322,39 @@ def extract_json(text):
     try:
         # 1. 직접 JSON 파싱 시도
         cleaned = text.removeprefix("```json").removesuffix("```").strip()
-        return json.loads(cleaned)
+        return _json_loads(cleaned)
     except json.JSONDecodeError:
         pass
     
     try:
         # 2. ```json 블록에서 추출
-        json_match = re.search(r'```json\s*\n(.*?)\n```', text, re.DOTALL)
+        json_match = _JSON_BLOCK_RE.search(text)
         if json_match:
-            return json.loads(json_match.group(1).strip())
+            return _json_loads(json_match.group(1).strip())
     except json.JSONDecodeError:
         pass
     
+    # 3, 4단계는 UTF-8 바이트에서 한 번만 인코딩해 탐색 (ASCII 괄호는 멀티바이트 문자 안에 나타나지 않음)
+    buf = text.encode("utf-8", "replace")
+    
     try:
         # 3. 첫 번째 { }로 둘러싸인 부분 추출
-        start = text.find('{')
-        if start != -1:
-            brace_count = 0
-            end = start
-            for i, char in enumerate(text[start:], start):
-                if char == '{':
-                    brace_count += 1
-                elif char == '}':
-                    brace_count -= 1
-                    if brace_count == 0:
-                        end = i + 1
-                        break
-            
-            json_str = text[start:end]
-            return json.loads(json_str)
+        json_bytes = _balanced_span(buf, ord('{'), ord('}'))
+        if json_bytes is not None:
+            return _json_loads(json_bytes)
     except json.JSONDecodeError:
         pass
     
     try:
         # 4. [ ]로 둘러싸인 배열 추출
-        start = text.find('[')
-        if start != -1:
-            bracket_count = 0
-            end = start
-            for i, char in enumerate(text[start:], start):
-                if char == '[':
-                    bracket_count += 1
-                elif char == ']':
-                    bracket_count -= 1
-                    if bracket_count == 0:
-                        end = i + 1
-                        break
-            
-            json_str = text[start:end]
-            return json.loads(json_str)
+        json_bytes = _balanced_span(buf, ord('['), ord(']'))
+        if json_bytes is not None:
+            return _json_loads(json_bytes)
     except json.JSONDecodeError:
         pass
     
     # 5. 모든 방법 실패시 기본값 반환
-    print(f"JSON 추출 실패. 원본 텍스트: {text[:200]}...")
+    log.warning("JSON 추출 실패. 원본 텍스트: %s...", text[:200])
     return {
         "title": "Unknown Community",
         "summary": "Failed to parse community summary",
@@ -718,60 +1376,150 @@ def extract_json(text):
 # MERGE (n)-[:IN_COMMUNITY]->(c)
 # """
 
+# Communities are written first, then memberships, each from its own UNWIND
 import_community_query = """
+CALL () {
+  UNWIND $data AS row
+  MERGE (c:__Community__ {communityId: row.communityId})
+  SET c.title = row.community.title,
+      c.summary = row.community.summary,
+      c.rating = row.community.rating,
+      c.rating_explanation = row.community.rating_explanation
+}
+CALL () {
+  UNWIND $data AS row
+  MATCH (c:__Community__ {communityId: row.communityId})
+  UNWIND row.nodes AS node
+  MERGE (n:__Entity__ {name: node})
+  MERGE (n)-[:IN_COMMUNITY]->(c)
+}
+"""
+
+
+def import_community(communities, driver=None):
+    """
+    Import community reports and their member entities to Neo4j
+    
+    Args:
+        communities: List of {"communityId", "community", "nodes"} dictionaries
+        driver: Neo4j driver (optional)
+    
+    Returns:
+        The execute_query result (records, summary, keys)
+    """
+    if driver is None:
+        if not UTILS_AVAILABLE or neo4j_driver is None:
+            raise RuntimeError("Neo4j driver not available. Please check utils_strand connection.")
+        driver = neo4j_driver
+    
+    ensure_constraints(driver)
+    result = driver.execute_query(_Q_IMPORT_COMMUNITY, data=communities, database_=NEO4J_DATABASE)
+    _touch_community_version()
+    return result
+
+import_entity_summary_query = """
 UNWIND $data AS row
-MERGE (c:__Community__ {communityId: row.communityId})
-SET c.title = row.community.title,
-    c.summary = row.community.summary,
-    c.rating = row.community.rating,
-    c.rating_explanation = row.community.rating_explanation
-WITH c, row
-UNWIND row.nodes AS node
-MERGE (n:__Entity__ {name: node})
-MERGE (n)-[:IN_COMMUNITY]->(c)
+MATCH (e:__Entity__ {name: row.entity})
+SET e.summary = row.summary
 """
 
-def import_entity_summary(entity_information, driver=None):
-    """Import entity summaries to Neo4j"""
+import_rels_summary_query = """
+UNWIND $data AS row
+MATCH (s:__Entity__ {name: row.source}), (t:__Entity__ {name: row.target})
+MERGE (s)-[r:SUMMARIZED_RELATIONSHIP]-(t)
+SET r.summary = row.summary
+"""
+
+# If there was only 1 description use that
+finalize_entity_summaries_query = """
+MATCH (e:__Entity__)
+WHERE size(e.description) = 1
+SET e.summary = e.description[0]
+"""
+
+finalize_rels_summaries_query = """
+MATCH (s:__Entity__)-[e:RELATIONSHIP]-(t:__Entity__)
+WHERE NOT (s)-[:SUMMARIZED_RELATIONSHIP]-(t)
+MERGE (s)-[r:SUMMARIZED_RELATIONSHIP]-(t)
+SET r.summary = e.description
+"""
+
+SUMMARY_BATCH_SIZE = 10_000
+
+
+def _chunked(items, size):
+    """Yield consecutive slices of at most size items"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _write_batch(tx, query, data):
+    tx.run(query, data=data).consume()
+
+
+def _import_in_batches(driver, query, data, batch_size):
+    """Run an UNWIND $data query in fixed-size managed write transactions"""
+    with _session(driver) as session:
+        for batch in _chunked(data, batch_size):
+            session.execute_write(_write_batch, query, batch)
+
+
+def finalize_summaries(driver=None, entities: bool = True, relationships: bool = True):
+    """
+    Backfill summaries that need no LLM call, once ingestion is done
+    
+    Args:
+        driver: Neo4j driver (optional)
+        entities: Use the single description of entities that have only one
+        relationships: Summarize entity pairs that have no SUMMARIZED_RELATIONSHIP yet
+    """
+    if driver is None:
+        if not UTILS_AVAILABLE or neo4j_driver is None:
+            raise RuntimeError("Neo4j driver not available. Please check utils_strand connection.")
+        driver = neo4j_driver
+    
+    if entities:
+        driver.execute_query(_Q_FINALIZE_ENTITY_SUMMARIES, database_=NEO4J_DATABASE)
+    if relationships:
+        driver.execute_query(_Q_FINALIZE_RELS_SUMMARIES, database_=NEO4J_DATABASE)
+    _touch_community_version()
+
+
+def import_entity_summary(entity_information, driver=None, batch_size: int = SUMMARY_BATCH_SIZE,
+                          finalize: bool = True):
+    """
+    Import entity summaries to Neo4j
+    
+    Pass finalize=False when importing in several calls and run
+    finalize_summaries() once at the end instead of after every call.
+    """
     if driver is None:
         if not UTILS_AVAILABLE or neo4j_driver is None:
             raise RuntimeError("Neo4j driver not available. Please check utils_strand connection.")
         driver = neo4j_driver
     
-    driver.execute_query("""
-    UNWIND $data AS row
-    MATCH (e:__Entity__ {name: row.entity})
-    SET e.summary = row.summary
-    """, data=entity_information)
-    
-    # If there was only 1 description use that
-    driver.execute_query("""
-    MATCH (e:__Entity__)
-    WHERE size(e.description) = 1
-    SET e.summary = e.description[0]
-    """)
-
-def import_rels_summary(rel_summaries, driver=None):
-    """Import relationship summaries to Neo4j"""
+    _import_in_batches(driver, import_entity_summary_query, list(entity_information), batch_size)
+    _touch_community_version()
+    if finalize:
+        finalize_summaries(driver, relationships=False)
+
+def import_rels_summary(rel_summaries, driver=None, batch_size: int = SUMMARY_BATCH_SIZE,
+                        finalize: bool = True):
+    """
+    Import relationship summaries to Neo4j
+    
+    Pass finalize=False when importing in several calls and run
+    finalize_summaries() once at the end instead of after every call.
+    """
     if driver is None:
         if not UTILS_AVAILABLE or neo4j_driver is None:
             raise RuntimeError("Neo4j driver not available. Please check utils_strand connection.")
         driver = neo4j_driver
     
-    driver.execute_query("""
-    UNWIND $data AS row
-    MATCH (s:__Entity__ {name: row.source}), (t:__Entity__ {name: row.target})
-    MERGE (s)-[r:SUMMARIZED_RELATIONSHIP]-(t)
-    SET r.summary = row.summary
-    """, data=rel_summaries)
-    
-    # If there was only 1 description use that
-    driver.execute_query("""
-    MATCH (s:__Entity__)-[e:RELATIONSHIP]-(t:__Entity__)
-    WHERE NOT (s)-[:SUMMARIZED_RELATIONSHIP]-(t)
-    MERGE (s)-[r:SUMMARIZED_RELATIONSHIP]-(t)
-    SET r.summary = e.description
-    """)
+    _import_in_batches(driver, import_rels_summary_query, list(rel_summaries), batch_size)
+    _touch_community_version()
+    if finalize:
+        finalize_summaries(driver, entities=False)
 
 community_info_query = """MATCH (e:__Entity__)
 WHERE e.louvain IS NOT NULL
@@ -785,6 +1533,29 @@ WITH louvain, nodeData,
      collect(DISTINCT {start: source.name, type: type(r), end: target.name, description: r.description}) AS rels
 RETURN louvain AS communityId, nodeData AS nodes, rels"""
 
+# Query objects for the queries sent through session.run / execute_query, built once at import
+# and tagged so they can be told apart in the server's query log and SHOW TRANSACTIONS
+_Q_ENTITY_NAME_BOUNDS = Query(entity_name_bounds_query, metadata={"query": "entity_name_bounds"})
+_Q_ENTITY_EDGES = Query(entity_edges_query, metadata={"query": "entity_edges"})
+_Q_RELATIONSHIP_COUNT = Query(relationship_count_query, metadata={"query": "relationship_count"})
+_Q_SET_COMMUNITY = Query(set_community_query, metadata={"query": "set_community"})
+_Q_SET_COMMUNITY_FALLBACK = Query(set_community_fallback_query, metadata={"query": "set_community"})
+_Q_IMPORT_COMMUNITY = Query(import_community_query, metadata={"query": "import_community"})
+_Q_FINALIZE_ENTITY_SUMMARIES = Query(finalize_entity_summaries_query, metadata={"query": "finalize_summaries"})
+_Q_FINALIZE_RELS_SUMMARIES = Query(finalize_rels_summaries_query, metadata={"query": "finalize_summaries"})
+_Q_COMMUNITY_INFO = Query(community_info_query, metadata={"query": "community_info"})
+
+
+def _response_text(response):
+    """Ensure an LLM response is a string"""
+    if hasattr(response, 'text'):
+        return response.text
+    if hasattr(response, 'content'):
+        return response.content
+    if not isinstance(response, str):
+        return str(response)
+    return response
+
 
 def extract_entities_with_llm(text: str, entity_types: str, model: str = "bedrock") -> tuple:
     """
@@ -802,18 +1573,11 @@ def extract_entities_with_llm(text: str, entity_types: str, model: str = "bedroc
         raise RuntimeError("utils_strand not available. Cannot use LLM functionality.")
     
     prompt = create_extraction_prompt(entity_types, text)
+    response = None
     
     try:
         if STRANDS_AVAILABLE:
-            response = chat_bedrock(prompt)
-            
-            # Ensure response is a string
-            if hasattr(response, 'text'):
-                response = response.text
-            elif hasattr(response, 'content'):
-                response = response.content
-            elif not isinstance(response, str):
-                response = str(response)
+            response = _response_text(chat_bedrock(prompt, stateless=True, stream=False))
         else:
             raise RuntimeError("Strands not available. Cannot perform entity extraction.")
         
@@ -821,11 +1585,270 @@ def extract_entities_with_llm(text: str, entity_types: str, model: str = "bedroc
         return entities, relationships
         
     except Exception as e:
-        print(f"Error in entity extraction: {e}")
-        print(f"Response type: {type(response) if 'response' in locals() else 'Unknown'}")
+        log.warning("Error in entity extraction: %s", e)
+        log.debug("Response type: %s", type(response) if response is not None else "Unknown")
         return [], []
 
 
+# Passages per prompt for extract_entities_batch before any adaptive halving
+EXTRACTION_BATCH_SIZE = int(os.environ.get("EXTRACTION_BATCH_SIZE", "8"))
+
+
+def _extract_group(chunks, entity_types):
+    """Extract several chunks with one prompt; None if the response cannot be split"""
+    response = None
+    try:
+        response = _response_text(chat_bedrock(create_batch_extraction_prompt(entity_types, chunks),
+                                               stateless=True, stream=False))
+        sections = split_batch_extraction_output(response, len(chunks))
+        if sections is None:
+            log.debug("Batch response did not contain %d passage markers", len(chunks))
+            return None
+        return [parse_extraction_output(section) for section in sections]
+    except Exception as e:
+        log.warning("Error in batch entity extraction: %s", e)
+        log.debug("Response type: %s", type(response) if response is not None else "Unknown")
+        return None
+
+
+def extract_entities_batch(chunks: List[str], entity_types: str,
+                           batch_size: int = EXTRACTION_BATCH_SIZE) -> List[tuple]:
+    """
+    Extract entities and relationships from several chunks per LLM call
+    
+    The extraction instructions and examples are sent once per group of
+    batch_size chunks instead of once per chunk. When a response cannot be
+    split back into passages, the group size is halved and the group retried;
+    at size 1 chunks go through extract_entities_with_llm.
+    
+    Args:
+        chunks: Input texts to process
+        entity_types: Comma-separated entity types
+        batch_size: Initial number of chunks per prompt
+    
+    Returns:
+        List of (entities, relationships) tuples, one per chunk, in input order
+    """
+    if not UTILS_AVAILABLE:
+        raise RuntimeError("utils_strand not available. Cannot use LLM functionality.")
+    if not STRANDS_AVAILABLE:
+        raise RuntimeError("Strands not available. Cannot perform entity extraction.")
+    
+    results = []
+    size = max(1, batch_size)
+    i = 0
+    while i < len(chunks):
+        group = chunks[i:i + size]
+        if len(group) == 1:
+            results.append(extract_entities_with_llm(group[0], entity_types))
+        else:
+            parsed = _extract_group(group, entity_types)
+            if parsed is None:
+                size //= 2
+                continue
+            results.extend(parsed)
+        i += len(group)
+    return results
+
+
+async def aextract_entities_with_llm(text: str, entity_types: str, model: str = "bedrock") -> tuple:
+    """Async variant of extract_entities_with_llm"""
+    # Bedrock chat through Strands is synchronous, so run it on the default thread pool
+    return await asyncio.to_thread(extract_entities_with_llm, text, entity_types, model)
+
+
+async def aextract_chunk(chunk: str, entity_types: str, sem: asyncio.Semaphore) -> tuple:
+    """
+    Extract entities and relationships from one chunk without blocking the event loop
+    
+    Args:
+        chunk: Input text to process
+        entity_types: Comma-separated entity types
+        sem: Semaphore capping the number of in-flight LLM calls
+    
+    Returns:
+        Tuple of (entities, relationships)
+    """
+    async with sem:
+        return await aextract_entities_with_llm(chunk, entity_types)
+
+
+async def extract_many(chunks: List[str], entity_types: str, concurrency: int = 16) -> List[tuple]:
+    """
+    Extract entities and relationships from many chunks concurrently
+    
+    Args:
+        chunks: Input texts to process
+        entity_types: Comma-separated entity types
+        concurrency: Maximum number of LLM calls in flight
+    
+    Returns:
+        List of (entities, relationships) tuples, in the same order as chunks
+    """
+    sem = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(*[aextract_chunk(chunk, entity_types, sem) for chunk in chunks])
+
+
+def run_many(texts: List[str], entity_types: str = "ORGANIZATION,PERSON,LOCATION,EVENT",
+             concurrency: int = 16) -> List[tuple]:
+    """
+    Synchronous entry point for extract_many
+    
+    Args:
+        texts: Input texts to process
+        entity_types: Comma-separated entity types
+        concurrency: Maximum number of LLM calls in flight
+    
+    Returns:
+        List of (entities, relationships) tuples, in the same order as texts
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(extract_many(texts, entity_types, concurrency))
+    
+    # Inside a running event loop (e.g. Jupyter) asyncio.run is not allowed; use threads directly
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(lambda text: extract_entities_with_llm(text, entity_types), texts))
+
+
+# Extraction results cache: exact (hash) hits first, then near-duplicate chunks by embedding.
+# Opt-in: set EXTRACTION_CACHE_PATH to an SQLite file to enable it; empty (the default) disables it.
+EXTRACTION_CACHE_PATH = os.environ.get("EXTRACTION_CACHE_PATH", "")
+# Cosine similarity above which a near-duplicate chunk's records are reused; empty disables the semantic tier
+_semantic_threshold = os.environ.get("SEMANTIC_CACHE_THRESHOLD", "")
+SEMANTIC_CACHE_THRESHOLD = float(_semantic_threshold) if _semantic_threshold else None
+
+
+class _ExtractionCache:
+    """SQLite-backed store of parsed extraction records plus an in-memory embedding matrix"""
+    
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "hash TEXT PRIMARY KEY, entity_types TEXT, embedding BLOB, response TEXT)"
+        )
+        self._conn.commit()
+        # entity_types -> [list of hashes, preallocated float32 matrix, rows in use]
+        self._vectors = {}
+        for key, entity_types, blob in self._conn.execute(
+            "SELECT hash, entity_types, embedding FROM cache WHERE embedding IS NOT NULL"
+        ):
+            self._add_vector(entity_types, key, np.frombuffer(blob, dtype=np.float32))
+    
+    def _add_vector(self, entity_types, key, vector):
+        entry = self._vectors.get(entity_types)
+        if entry is None:
+            entry = self._vectors[entity_types] = [[], np.empty((64, len(vector)), dtype=np.float32), 0]
+        keys, matrix, size = entry
+        if size == len(matrix):
+            # Double the capacity so appends stay amortized O(1)
+            grown = np.empty((2 * len(matrix), matrix.shape[1]), dtype=np.float32)
+            grown[:size] = matrix
+            entry[1] = matrix = grown
+        matrix[size] = vector
+        keys.append(key)
+        entry[2] = size + 1
+    
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM cache WHERE hash = ?", (key,)).fetchone()
+        return None if row is None else _json_loads(row[0])
+    
+    def search(self, entity_types, vector, threshold):
+        """Return the key of the most similar cached chunk if it clears threshold"""
+        with self._lock:
+            entry = self._vectors.get(entity_types)
+            if entry is None:
+                return None
+            keys, matrix, size = entry
+            # Rows past size may be written by a later put, so take the view now
+            matrix = matrix[:size]
+        # Titan embeddings are normalized, so the dot product is the cosine similarity
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        return keys[best] if scores[best] >= threshold else None
+    
+    def put(self, key, entity_types, vector, records):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                (key, entity_types, None if vector is None else vector.tobytes(), _json_dumps(records))
+            )
+            self._conn.commit()
+            if vector is not None:
+                self._add_vector(entity_types, key, vector)
+
+
+_extraction_cache = None
+_extraction_cache_lock = threading.Lock()
+
+
+def _get_extraction_cache():
+    global _extraction_cache
+    if not EXTRACTION_CACHE_PATH:
+        return None
+    with _extraction_cache_lock:
+        if _extraction_cache is None:
+            _extraction_cache = _ExtractionCache(EXTRACTION_CACHE_PATH)
+        return _extraction_cache
+
+
+def _records_in_chunk(chunk, entities, relationships):
+    """Keep the entities named in chunk and the relationships whose endpoints both are"""
+    text = chunk.lower()
+    entities = [e for e in entities if str(e.get("entity_name", "")).lower() in text]
+    relationships = [
+        r for r in relationships
+        if str(r.get("source_entity", "")).lower() in text and str(r.get("target_entity", "")).lower() in text
+    ]
+    return entities, relationships
+
+
+def cached_extract(chunk: str, entity_types: str) -> tuple:
+    """
+    Extract entities and relationships, reusing results for identical or near-duplicate chunks
+    
+    Without EXTRACTION_CACHE_PATH this is extract_entities_with_llm. Records
+    reused from a near-duplicate chunk (SEMANTIC_CACHE_THRESHOLD) are filtered
+    down to the names that actually occur in chunk.
+    
+    Args:
+        chunk: Input text to process
+        entity_types: Comma-separated entity types
+    
+    Returns:
+        Tuple of (entities, relationships)
+    """
+    if not UTILS_AVAILABLE:
+        raise RuntimeError("utils_strand not available. Cannot use LLM functionality.")
+    
+    cache = _get_extraction_cache()
+    if cache is None:
+        return extract_entities_with_llm(chunk, entity_types)
+    key = hashlib.sha1(f"{entity_types}|{chunk}".encode("utf-8")).hexdigest()
+    
+    records = cache.get(key)
+    if records is not None:
+        return records[0], records[1]
+    
+    vector = None
+    if SEMANTIC_CACHE_THRESHOLD is not None:
+        vector = np.asarray(embed(chunk), dtype=np.float32)
+        similar_key = cache.search(entity_types, vector, SEMANTIC_CACHE_THRESHOLD)
+        if similar_key is not None:
+            records = cache.get(similar_key)
+            return _records_in_chunk(chunk, records[0], records[1])
+    
+    entities, relationships = extract_entities_with_llm(chunk, entity_types)
+    # Failed extractions also come back empty, so only cache non-empty results
+    if entities or relationships:
+        cache.put(key, entity_types, vector, [entities, relationships])
+    return entities, relationships
+
+
 def generate_community_report_with_llm(nodes: str, relationships: str, model: str = "bedrock") -> dict:
     """
     Generate community report using LLM
@@ -842,10 +1865,11 @@ def generate_community_report_with_llm(nodes: str, relationships: str, model: st
         raise RuntimeError("utils_strand not available. Cannot use LLM functionality.")
     
     prompt = get_summarize_community_prompt(nodes, relationships)
+    response = None
     
     try:
         if STRANDS_AVAILABLE:
-            response = chat_bedrock(prompt)
+            response = chat_bedrock(prompt, stateless=True, stream=False)
             
             # Ensure response is a string
             if hasattr(response, 'text'):
@@ -857,16 +1881,20 @@ def generate_community_report_with_llm(nodes: str, relationships: str, model: st
         else:
             raise RuntimeError("Strands not available. Cannot generate community report.")
         
-        # Extract JSON from response
-        json_str = extract_json(response)
-        return json.loads(json_str)
+        # extract_json already returns the parsed report
+        return extract_json(response)
         
     except Exception as e:
-        print(f"Error in community report generation: {e}")
-        print(f"Response type: {type(response) if 'response' in locals() else 'Unknown'}")
+        log.warning("Error in community report generation: %s", e)
+        log.debug("Response type: %s", type(response) if response is not None else "Unknown")
         return {}
 
 
+async def agenerate_community_report_with_llm(nodes: str, relationships: str, model: str = "bedrock") -> dict:
+    """Async variant of generate_community_report_with_llm"""
+    return await asyncio.to_thread(generate_community_report_with_llm, nodes, relationships, model)
+
+
 def import_nodes_and_relationships(book_id: str, chunk_id: str, text: str, 
                                  entities: List[Dict], relationships: List[Dict], 
                                  driver=None):
@@ -886,40 +1914,138 @@ def import_nodes_and_relationships(book_id: str, chunk_id: str, text: str,
             raise RuntimeError("Neo4j driver not available. Please check utils_strand connection.")
         driver = neo4j_driver
     
-    # Import nodes
-    driver.execute_query(
-        import_nodes_query,
-        book_id=book_id,
-        chunk_id=chunk_id,
-        text=text,
-        data=entities
-    )
+    ensure_constraints(driver)
+    # Import nodes and relationships in one transaction
+    with _session(driver) as session:
+        session.execute_write(_import_chunk, book_id, chunk_id, text, entities, relationships)
+
+
+# Chunks written per transaction by process_book_chunks
+BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "100"))
+
+
+def import_chunk_batch(chunks: List[tuple], driver=None):
+    """
+    Import the entities and relationships of many chunks in one transaction
     
-    # Import relationships
-    if relationships:
-        driver.execute_query(
-            import_relationships_query,
-            data=relationships
-        )
+    Rows are UNWIND'ed server-side, so a batch costs one round trip and one
+    commit instead of one per chunk. Chunks are written in order, exactly as
+    repeated import_nodes_and_relationships calls would write them.
+    
+    Args:
+        chunks: (book_id, chunk_id, text, entities, relationships) tuples
+        driver: Neo4j driver (optional)
+    """
+    if not chunks:
+        return
+    if driver is None:
+        if not UTILS_AVAILABLE or neo4j_driver is None:
+            raise RuntimeError("Neo4j driver not available. Please check utils_strand connection.")
+        driver = neo4j_driver
+    
+    ensure_constraints(driver)
+    with _session(driver) as session:
+        session.execute_write(_import_batch, chunks)
 
 
-def get_community_info(driver=None) -> List[Dict]:
+def get_community_info(driver=None, cache_path=None) -> List[Dict]:
     """
     Get community information from Neo4j
     
     Args:
         driver: Neo4j driver (optional)
+        cache_path: File to write the result to, and to reuse it from while it is
+            newer than COMMUNITY_VERSION_PATH; without that marker file the
+            cache is never reused (optional)
     
     Returns:
         List of community information dictionaries
     """
+    if cache_path is not None:
+        cache_path = Path(cache_path)
+        version_path = Path(COMMUNITY_VERSION_PATH)
+        if (COMMUNITY_VERSION_PATH and version_path.exists() and cache_path.exists()
+                and cache_path.stat().st_mtime > version_path.stat().st_mtime):
+            return _json_loads(cache_path.read_bytes())
+    
+    if driver is None:
+        if not UTILS_AVAILABLE or neo4j_driver is None:
+            raise RuntimeError("Neo4j driver not available. Please check utils_strand connection.")
+        driver = neo4j_driver
+    
+    records, _, _ = driver.execute_query(_Q_COMMUNITY_INFO, database_=NEO4J_DATABASE)
+    communities = [record.data() for record in records]
+    
+    if cache_path is not None:
+        payload = _json_dumps(communities)
+        cache_path.write_bytes(payload if isinstance(payload, bytes) else payload.encode("utf-8"))
+    return communities
+
+
+@dataclass(slots=True)
+class CommunityRecord:
+    """One row of community_info_query, stored column-wise"""
+    community_id: int
+    node_names: np.ndarray
+    node_descriptions: np.ndarray
+    node_types: np.ndarray
+    rel_starts: np.ndarray
+    rel_types: np.ndarray
+    rel_ends: np.ndarray
+    rel_descriptions: np.ndarray
+    
+    @property
+    def nodes(self) -> List[Dict]:
+        """Nodes in the list-of-dicts shape get_community_info returns"""
+        return [{"id": name, "description": description, "type": node_type}
+                for name, description, node_type
+                in zip(self.node_names, self.node_descriptions, self.node_types)]
+    
+    @property
+    def rels(self) -> List[Dict]:
+        """Relationships in the list-of-dicts shape get_community_info returns"""
+        return [{"start": start, "type": rel_type, "end": end, "description": description}
+                for start, rel_type, end, description
+                in zip(self.rel_starts, self.rel_types, self.rel_ends, self.rel_descriptions)]
+
+
+def _column(items, key):
+    # fromiter keeps list-valued fields as elements instead of adding a dimension
+    return np.fromiter((item[key] for item in items), dtype=object, count=len(items))
+
+
+def iter_community_info(driver=None) -> Iterator[CommunityRecord]:
+    """
+    Stream community information from Neo4j one community at a time
+    
+    Unlike get_community_info, records are consumed as the server sends them
+    and each community is kept as NumPy columns rather than per-item dicts.
+    
+    Args:
+        driver: Neo4j driver (optional)
+    
+    Yields:
+        CommunityRecord per community
+    """
     if driver is None:
         if not UTILS_AVAILABLE or neo4j_driver is None:
             raise RuntimeError("Neo4j driver not available. Please check utils_strand connection.")
         driver = neo4j_driver
     
-    records, _, _ = driver.execute_query(community_info_query)
-    return [record.data() for record in records]
+    with _session(driver) as session:
+        for record in session.run(_Q_COMMUNITY_INFO):
+            nodes = record["nodes"]
+            rels = record["rels"]
+            yield CommunityRecord(
+                community_id=record["communityId"],
+                node_names=_column(nodes, "id"),
+                node_descriptions=_column(nodes, "description"),
+                node_types=_column(nodes, "type"),
+                rel_starts=_column(rels, "start"),
+                rel_types=_column(rels, "type"),
+                rel_ends=_column(rels, "end"),
+                rel_descriptions=_column(rels, "description"),
+            )
 
 
 def test_ch07_tools_connectivity():
@@ -1111,11 +2237,30 @@ Do not include information where the supporting evidence for it is not provided.
 Add sections and commentary to the response as appropriate for the length and format. Style the response in markdown.
 """
 
+def _compile_prompt(template):
+    """
+    Pre-parse a str.format template into (literal, field) pairs once
+    
+    Rendering is then a single join over the parts instead of re-scanning the
+    whole template (and its escaped braces) on every call.
+    """
+    parts = tuple((literal, field) for literal, field, _, _ in string.Formatter().parse(template))
+    
+    def render(**values):
+        return "".join([literal + str(values[field]) if field is not None else literal
+                        for literal, field in parts])
+    
+    return render
+
+
+_render_map_prompt = _compile_prompt(MAP_SYSTEM_PROMPT)
+_render_reduce_prompt = _compile_prompt(REDUCE_SYSTEM_PROMPT)
+
 def get_map_system_prompt(context):
-    return MAP_SYSTEM_PROMPT.format(context_data=context)
+    return _render_map_prompt(context_data=context)
 
 def get_reduce_system_prompt(report_data, response_type: str = "multiple paragraphs"):
-    return REDUCE_SYSTEM_PROMPT.format(report_data=report_data, response_type=response_type)
+    return _render_reduce_prompt(report_data=report_data, response_type=response_type)
 
 LOCAL_SEARCH_SYSTEM_PROMPT = """
 ---Role---
@@ -1182,8 +2327,10 @@ Do not include information where the supporting evidence for it is not provided.
 Add sections and commentary to the response as appropriate for the length and format. Style the response in markdown.
 """
 
+_render_local_prompt = _compile_prompt(LOCAL_SEARCH_SYSTEM_PROMPT)
+
 def get_local_system_prompt(report_data, response_type: str = "multiple paragraphs"):
-    return LOCAL_SEARCH_SYSTEM_PROMPT.format(context_data=report_data, response_type=response_type)
+    return _render_local_prompt(context_data=report_data, response_type=response_type)
 # =============================================================================
 # EXPORTED FUNCTIONS AND VARIABLES
 # =============================================================================
@@ -1191,25 +2338,25 @@ def get_local_system_prompt(report_data, response_type: str = "multiple paragrap
 
 # Database connection
 __all__ = [
-    # Neo4j connection
-    'neo4j_driver',
-    
-    # Text processing utilities
-    'num_tokens_from_string',
-    'chunk_text',
-    
-    # LLM functions
-    'chat',
-    'chat_bedrock',
-    'embed',
-    'embed_bedrock', 
-    'embed_openai',
+    # Logging
+    'setup_logging',
     
     # Graph extraction and processing
     'create_extraction_prompt',
     'parse_extraction_output',
+    'parse_extraction_records',
+    'Entity',
+    'Relationship',
     'extract_entities_with_llm',
+    'extract_entities_batch',
+    'create_batch_extraction_prompt',
+    'split_batch_extraction_output',
     'extract_entities',
+    'aextract_chunk',
+    'extract_many',
+    'aextract_entities_with_llm',
+    'run_many',
+    'cached_extract',
     'process_book_chunks',
     'bedrock_only_pipeline',
     
@@ -1217,25 +2364,35 @@ __all__ = [
     'calculate_communities',
     'get_summarize_community_prompt',
     'generate_community_report_with_llm',
+    'agenerate_community_report_with_llm',
     'get_community_info',
+    'iter_community_info',
+    'CommunityRecord',
     
     # Data import functions
     'import_nodes_and_relationships',
+    'import_chunk_batch',
+    'BATCH_SIZE',
     'import_entity_summary',
     'import_rels_summary',
+    'finalize_summaries',
+    'import_community',
+    'ensure_constraints',
     
     # Utility functions
     'extract_json',
     'get_summarize_prompt',
     'test_ch07_tools_connectivity',
-    'test_neo4j_connection',
-    'test_all_connections',
     
     # Constants and queries
     'import_nodes_query',
     'import_relationships_query',
+    'import_chunk_query',
+    'build_import_nodes_query',
+    'build_import_queries',
     'import_community_query',
     'community_info_query',
+    'set_community_query',
     
     # Availability flags
     'UTILS_AVAILABLE',
@@ -1243,36 +2400,9 @@ __all__ = [
     'OPENAI_AVAILABLE'
 ]
 
-# Convenience aliases for backward compatibility
+# utils_strand names are re-exported only when it imported
 if UTILS_AVAILABLE:
-    # Make sure all functions are available at module level
-    globals().update({
-        'neo4j_driver': neo4j_driver,
-        'num_tokens_from_string': num_tokens_from_string,
-        'chunk_text': chunk_text,
-        'chat': chat,
-        'embed': embed,
-        'chat_bedrock': chat_bedrock if STRANDS_AVAILABLE else None,
-        'embed_bedrock': embed_bedrock,
-        'embed_openai': embed_openai,
-        'test_neo4j_connection': test_neo4j_connection,
-        'test_all_connections': test_all_connections,
-    })
-else:
-    # Provide fallback functions if utils_strand is not available
-    def _not_available(*args, **kwargs):
-        raise RuntimeError("utils_strand not available. Please check your installation.")
-    
-    neo4j_driver = None
-    num_tokens_from_string = _not_available
-    chunk_text = _not_available
-    chat = _not_available
-    embed = _not_available
-    chat_bedrock = _not_available
-    embed_bedrock = _not_available
-    embed_openai = _not_available
-    test_neo4j_connection = _not_available
-    test_all_connections = _not_available
+    __all__ += [name for name in utils_strand.__all__ if name not in __all__]
 
 def extract_entities(text: str, entity_types: str = "ORGANIZATION,PERSON,LOCATION,EVENT") -> tuple:
     """
@@ -1288,46 +2418,184 @@ def extract_entities(text: str, entity_types: str = "ORGANIZATION,PERSON,LOCATIO
     return extract_entities_with_llm(text, entity_types, model="bedrock")
 
 
-def process_book_chunks(chunked_books: List[List[str]], number_of_books: int = 1, 
-                       entity_types: str = "ORGANIZATION,PERSON,LOCATION,EVENT"):
+def _flush_chunks(pending):
+    """
+    Write the pending chunks as one batch, falling back to one chunk at a time on failure
+    
+    Returns:
+        Indices into pending of the chunks that were committed
+    """
+    try:
+        _retry_transient(import_chunk_batch, pending)
+        committed = list(range(len(pending)))
+    except Exception as e:
+        log.warning("Batch import of %d chunks failed (%s); retrying chunk by chunk", len(pending), e)
+        committed = []
+        for i, (book_i, chunk_i, chunk, nodes, relationships) in enumerate(pending):
+            try:
+                import_nodes_and_relationships(book_i, chunk_i, chunk, nodes, relationships)
+                committed.append(i)
+            except Exception as e:
+                log.warning("Error processing book %s, chunk %s: %s", book_i, chunk_i, e)
+    pending.clear()
+    return committed
+
+
+# Bedrock extraction calls in flight at once in process_book_chunks
+EXTRACTION_CONCURRENCY = int(os.environ.get("EXTRACTION_CONCURRENCY", "16"))
+# Chunks with fewer tokens than this are not sent to the LLM
+MIN_TOKENS = int(os.environ.get("MIN_CHUNK_TOKENS", "1"))
+# Fingerprints of imported chunks, kept across runs when set; empty disables
+CHUNK_SEEN_PATH = os.environ.get("CHUNK_SEEN_PATH", "")
+
+
+def _chunk_key(chunk):
+    """Fingerprint of a chunk's text with whitespace normalized"""
+    return _chunk_digest(" ".join(chunk.split()).encode("utf-8"))
+
+
+def _load_seen(path):
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return set(f.read().split())
+
+
+def _save_seen(path, keys):
+    if path and keys:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(key + "\n" for key in keys))
+    keys.clear()
+
+
+class _ChunkWriter:
+    """Write extracted chunks to Neo4j on a background thread while extraction continues"""
+    
+    def __init__(self, batch_size: int, seen_path: str = "", maxsize: int = 256):
+        self.batch_size = max(1, batch_size)
+        self.seen_path = seen_path
+        # Bounded so extraction cannot run arbitrarily far ahead of the database
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._run, name="chunk-writer", daemon=True)
+        self._thread.start()
+    
+    def put(self, chunk: tuple, key: Optional[str]):
+        """
+        Queue one (book_id, chunk_id, text, entities, relationships) tuple for writing
+        
+        key is recorded in seen_path once the chunk is committed; None never records it.
+        """
+        self._queue.put((chunk, key))
+    
+    def close(self):
+        """Write everything still queued and stop the writer thread"""
+        self._queue.put(None)
+        self._thread.join()
+    
+    def _run(self):
+        done = False
+        while not done:
+            # Block for the first item, then take whatever else is already queued
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # None is the last item ever queued
+            if batch[-1] is None:
+                batch.pop()
+                done = True
+            if not batch:
+                continue
+            try:
+                committed = _flush_chunks([chunk for chunk, _ in batch])
+                # Only chunks that reached the database are skipped on the next run
+                _save_seen(self.seen_path, [batch[i][1] for i in committed if batch[i][1] is not None])
+            except Exception as e:
+                log.error("Error writing %d chunks: %s", len(batch), e)
+
+
+def process_book_chunks(chunked_books: Iterable[Iterable[str]], number_of_books: int = 1, 
+                       entity_types: str = "ORGANIZATION,PERSON,LOCATION,EVENT",
+                       batch_size: int = BATCH_SIZE,
+                       concurrency: int = EXTRACTION_CONCURRENCY,
+                       min_tokens: int = MIN_TOKENS,
+                       seen_path: str = CHUNK_SEEN_PATH):
     """
     Process book chunks and import to Neo4j using Bedrock
     
+    Books and chunks are consumed lazily, with at most a few chunks per
+    extraction worker held at once. Pass generators that read chunks from
+    disk to keep a large corpus out of memory; lists work as before.
+    
+    Empty, too-short and duplicate chunks (same text up to whitespace) are
+    skipped. With seen_path set, imported chunks are remembered across runs,
+    so re-running over the same books only processes new chunks.
+    
     Args:
-        chunked_books: List of books, each containing list of text chunks
+        chunked_books: Iterable of books, each an iterable of text chunks
         number_of_books: Number of books to process
         entity_types: Entity types to extract
+        batch_size: Number of chunks written per transaction
+        concurrency: Maximum number of extraction calls in flight
+        min_tokens: Chunks with fewer tokens are skipped
+        seen_path: File of imported chunk fingerprints ("" to disable)
     """
     if not UTILS_AVAILABLE or neo4j_driver is None:
         raise RuntimeError("Neo4j driver not available. Please check utils_strand connection.")
     
-    for book_i, book in enumerate(tqdm(chunked_books[:number_of_books], desc="Processing Books")):
-        for chunk_i, chunk in enumerate(tqdm(book, desc=f"Book {book_i}", leave=False)):
-            try:
-                # Extract entities using Bedrock
-                nodes, relationships = extract_entities(chunk, entity_types)
-                
-                # Import nodes
-                neo4j_driver.execute_query(
-                    import_nodes_query,
-                    data=nodes,
-                    book_id=book_i,
-                    text=chunk,
-                    chunk_id=chunk_i,
-                )
-                
-                # Import relationships
-                if relationships:
-                    neo4j_driver.execute_query(
-                        import_relationships_query, 
-                        data=relationships
-                    )
-                
-                print(f"Processed book {book_i}, chunk {chunk_i}: {len(nodes)} entities, {len(relationships)} relationships")
-                
-            except Exception as e:
-                print(f"Error processing book {book_i}, chunk {chunk_i}: {e}")
-                continue
+    # Create the entity_name constraint (and its index) before the first MERGE on it
+    ensure_constraints(neo4j_driver)
+    seen = _load_seen(seen_path)
+    # Neo4j writes run on their own thread, overlapping with the LLM calls
+    writer = _ChunkWriter(batch_size, seen_path)
+    # Submitted extractions, oldest first; drained in chunk order so the
+    # import order matches the sequential loop
+    in_flight = deque()
+    
+    def drain_oldest():
+        book_i, chunk_i, chunk, key, future = in_flight.popleft()
+        try:
+            nodes, relationships = future.result()
+        except Exception as e:
+            log.warning("Error processing book %s, chunk %s: %s", book_i, chunk_i, e)
+            return
+        
+        log.debug("Processed book %s, chunk %s: %d entities, %d relationships",
+                  book_i, chunk_i, len(nodes), len(relationships))
+        
+        # The writer commits up to batch_size queued chunks per transaction.
+        # An empty result may be a failed extraction, so it is retried next run.
+        writer.put((book_i, chunk_i, chunk, nodes, relationships),
+                   key if nodes or relationships else None)
+    
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for book_i, book in enumerate(tqdm(islice(chunked_books, number_of_books), desc="Processing Books")):
+                skipped = 0
+                for chunk_i, chunk in enumerate(tqdm(book, desc=f"Book {book_i}", leave=False)):
+                    # Drop chunks that would cost an LLM call and a write without adding anything new
+                    key = _chunk_key(chunk)
+                    if key in seen or not chunk.strip() or num_tokens_from_string(chunk) < min_tokens:
+                        seen.add(key)
+                        skipped += 1
+                        continue
+                    seen.add(key)
+                    
+                    in_flight.append((book_i, chunk_i, chunk, key,
+                                      executor.submit(extract_entities, chunk, entity_types)))
+                    # Keep every worker busy without reading the whole book ahead
+                    if len(in_flight) >= 2 * concurrency:
+                        drain_oldest()
+                if skipped:
+                    log.info("Book %s: skipping %d empty, short or duplicate chunks", book_i, skipped)
+            
+            while in_flight:
+                drain_oldest()
+    finally:
+        # Flushes whatever was extracted, even if the loop was interrupted
+        writer.close()
 
 
 def bedrock_only_pipeline(chunked_books: List[List[str]], number_of_books: int = 1):
@@ -1338,10 +2606,15 @@ def bedrock_only_pipeline(chunked_books: List[List[str]], number_of_books: int =
         chunked_books: List of books with chunks
         number_of_books: Number of books to process
     """
-    print("🚀 Starting Bedrock-only Knowledge Graph Pipeline")
+    if not UTILS_AVAILABLE:
+        raise RuntimeError("utils_strand not available. Please check your installation.")
+    
+    # Progress is reported through logging; show it unless the caller set logging up
+    setup_logging()
+    log.info("🚀 Starting Bedrock-only Knowledge Graph Pipeline")
     
     # Test connections first
-    print("📋 Testing connections...")
+    log.info("📋 Testing connections...")
     results = test_all_connections()
     
     if results.get("neo4j", {}).get("status") != "connected":
@@ -1353,23 +2626,27 @@ def bedrock_only_pipeline(chunked_books: List[List[str]], number_of_books: int =
     if not STRANDS_AVAILABLE:
         raise RuntimeError("Strands not available. Please install strands package.")
     
-    print("✅ All connections successful")
+    log.info("✅ All connections successful")
+    
+    # Index-backed MERGEs from the very first chunk
+    log.info("🗂️  Creating constraints and indexes...")
+    ensure_constraints(neo4j_driver)
     
     # Process books
-    print(f"📚 Processing {number_of_books} books...")
+    log.info("📚 Processing %d books...", number_of_books)
     process_book_chunks(chunked_books, number_of_books)
     
     # Calculate communities
-    print("🔗 Calculating communities...")
+    log.info("🔗 Calculating communities...")
     community_stats = calculate_communities()
-    print(f"Community calculation completed: {community_stats}")
+    log.info("Community calculation completed: %s", community_stats)
     
     # Get community info
-    print("📊 Getting community information...")
+    log.info("📊 Getting community information...")
     communities = get_community_info()
-    print(f"Found {len(communities)} communities")
+    log.info("Found %d communities", len(communities))
     
-    print("🎉 Pipeline completed successfully!")
+    log.info("🎉 Pipeline completed successfully!")
     return {
         "community_stats": community_stats,
         "communities": communities,
@@ -1377,6 +2654,81 @@ def bedrock_only_pipeline(chunked_books: List[List[str]], number_of_books: int =
     }
 
 
+# Rows deleted per transaction when clearing the graph with APOC
+DELETE_BATCH_SIZE = 10_000
+
+_apoc_checked = {}
+
+
+def _single_value(result):
+    """execute_query transformer: the first column of the only record, or 0 if there is none"""
+    record = result.single()
+    return record[0] if record is not None else 0
+
+
+def _apoc_available(driver):
+    """Whether apoc.periodic.iterate is installed, checked once per driver"""
+    if id(driver) not in _apoc_checked:
+        try:
+            _apoc_checked[id(driver)] = bool(driver.execute_query(
+                "SHOW PROCEDURES YIELD name WHERE name = 'apoc.periodic.iterate' RETURN count(*) > 0 AS available",
+                database_=NEO4J_DATABASE, result_transformer_=_single_value
+            ))
+        except Exception:
+            _apoc_checked[id(driver)] = False
+    return _apoc_checked[id(driver)]
+
+
+def _periodic_delete(driver, outer, inner, parallel, batch_size=DELETE_BATCH_SIZE):
+    """
+    Delete in independently committed batches with apoc.periodic.iterate
+    
+    Returns:
+        Number of rows deleted (the committed operations)
+    """
+    stats = driver.execute_query(
+        "CALL apoc.periodic.iterate($outer, $inner, {batchSize: $batch_size, parallel: $parallel, retries: $retries}) "
+        "YIELD batches, committedOperations, failedOperations, errorMessages "
+        "RETURN batches, committedOperations, failedOperations, errorMessages",
+        outer=outer, inner=inner, batch_size=batch_size, parallel=parallel, retries=NEO4J_WRITE_RETRIES,
+        database_=NEO4J_DATABASE, result_transformer_=Result.single
+    )
+    if stats["failedOperations"]:
+        log.warning("   - %s deletes failed: %s", stats["failedOperations"], stats["errorMessages"])
+    log.info("   - %s deleted in %s batches", stats["committedOperations"], stats["batches"])
+    return stats["committedOperations"]
+
+
+def _drop_schema(driver, kind, names):
+    """
+    Drop indexes or constraints by name in a single write transaction
+    
+    Names are backtick-quoted so arbitrary names are safe. If the batch fails,
+    each name is retried on its own so one bad drop does not keep the rest.
+    """
+    names = [name for name in names if name]
+    if not names:
+        return
+    commands = ["DROP {} `{}` IF EXISTS".format(kind, name.replace("`", "``")) for name in names]
+    
+    def drop_all(tx):
+        for command in commands:
+            tx.run(command).consume()
+    
+    try:
+        with _session(driver) as session:
+            session.execute_write(drop_all)
+        for name in names:
+            log.info("   - Dropped %s: %s", kind.lower(), name)
+    except Exception:
+        for name, command in zip(names, commands):
+            try:
+                driver.execute_query(command, database_=NEO4J_DATABASE)
+                log.info("   - Dropped %s: %s", kind.lower(), name)
+            except Exception as e:
+                log.warning("   - Failed to drop %s %s: %s", kind.lower(), name, e)
+
+
 def clear_all_graph_data(driver=None):
     """
     Neo4j 그래프의 모든 데이터를 지우는 함수
@@ -1393,53 +2745,60 @@ def clear_all_graph_data(driver=None):
             raise RuntimeError("Neo4j driver not available. Please check utils_strand connection.")
         driver = neo4j_driver
     
-    print("🗑️  Starting to clear all graph data...")
+    log.info("🗑️  Starting to clear all graph data...")
+    use_apoc = _apoc_available(driver)
     
     # 1. 모든 관계 삭제
-    print("   Deleting all relationships...")
-    result = driver.execute_query("MATCH ()-[r]-() DELETE r RETURN count(r) as deleted_relationships")
-    deleted_rels = result[0][0]["deleted_relationships"] if result[0] else 0
+    log.info("   Deleting all relationships...")
+    if use_apoc:
+        # Endpoints are shared between batches, so relationship batches run serially to avoid lock contention
+        deleted_rels = _periodic_delete(driver, "MATCH ()-[r]->() RETURN r", "DELETE r", parallel=False)
+    else:
+        deleted_rels = _retry_transient(
+            driver.execute_query, "MATCH ()-[r]->() DELETE r RETURN count(r) as deleted_relationships",
+            database_=NEO4J_DATABASE, result_transformer_=_single_value
+        )
     
     # 2. 모든 노드 삭제
-    print("   Deleting all nodes...")
-    result = driver.execute_query("MATCH (n) DELETE n RETURN count(n) as deleted_nodes")
-    deleted_nodes = result[0][0]["deleted_nodes"] if result[0] else 0
+    log.info("   Deleting all nodes...")
+    if use_apoc:
+        deleted_nodes = _periodic_delete(driver, "MATCH (n) RETURN n", "DETACH DELETE n", parallel=True)
+    else:
+        deleted_nodes = _retry_transient(
+            driver.execute_query, "MATCH (n) DELETE n RETURN count(n) as deleted_nodes",
+            database_=NEO4J_DATABASE, result_transformer_=_single_value
+        )
     
     # 3. GDS 그래프 삭제 (있다면)
-    print("   Cleaning up GDS graphs...")
+    log.info("   Cleaning up GDS graphs...")
     try:
-        driver.execute_query("CALL gds.graph.drop('entity')")
-        print("   - Dropped 'entity' graph")
+        driver.execute_query("CALL gds.graph.drop('entity')", database_=NEO4J_DATABASE)
+        log.info("   - Dropped 'entity' graph")
     except Exception:
-        print("   - No 'entity' graph to drop")
-    
-    # 4. 모든 인덱스 삭제
-    print("   Dropping all indexes...")
-    indexes_result = driver.execute_query("SHOW INDEXES")
-    for record in indexes_result[0]:
-        index_name = record.get("name")
-        if index_name:
-            try:
-                driver.execute_query(f"DROP INDEX {index_name}")
-                print(f"   - Dropped index: {index_name}")
-            except Exception as e:
-                print(f"   - Failed to drop index {index_name}: {e}")
-    
-    # 5. 모든 제약조건 삭제
-    print("   Dropping all constraints...")
-    constraints_result = driver.execute_query("SHOW CONSTRAINTS")
-    for record in constraints_result[0]:
-        constraint_name = record.get("name")
-        if constraint_name:
-            try:
-                driver.execute_query(f"DROP CONSTRAINT {constraint_name}")
-                print(f"   - Dropped constraint: {constraint_name}")
-            except Exception as e:
-                print(f"   - Failed to drop constraint {constraint_name}: {e}")
+        log.info("   - No 'entity' graph to drop")
+    
+    # 4. 모든 제약조건 삭제 (제약조건이 소유한 인덱스도 함께 삭제됨)
+    log.info("   Dropping all constraints...")
+    constraint_names = driver.execute_query(
+        "SHOW CONSTRAINTS YIELD name", database_=NEO4J_DATABASE, result_transformer_=Result.value
+    )
+    _drop_schema(driver, "CONSTRAINT", constraint_names)
+    
+    # 5. 남은 인덱스 삭제
+    log.info("   Dropping all indexes...")
+    index_names = driver.execute_query(
+        "SHOW INDEXES YIELD name, owningConstraint WHERE owningConstraint IS NULL RETURN name",
+        database_=NEO4J_DATABASE, result_transformer_=Result.value
+    )
+    _drop_schema(driver, "INDEX", index_names)
+    # ensure_constraints must recreate them on the next import
+    _constraints_ensured.discard(id(driver))
+    _touch_community_version()
     
     # 6. 최종 확인
-    final_check = driver.execute_query("MATCH (n) RETURN count(n) as remaining_nodes")
-    remaining_nodes = final_check[0][0]["remaining_nodes"] if final_check[0] else 0
+    remaining_nodes = driver.execute_query(
+        "MATCH (n) RETURN count(n) as remaining_nodes", database_=NEO4J_DATABASE, result_transformer_=_single_value
+    )
     
     stats = {
         "deleted_relationships": deleted_rels,
@@ -1448,17 +2807,57 @@ def clear_all_graph_data(driver=None):
         "status": "success" if remaining_nodes == 0 else "warning"
     }
     
-    print(f"✅ Graph cleanup completed!")
-    print(f"   - Deleted {deleted_rels} relationships")
-    print(f"   - Deleted {deleted_nodes} nodes")
-    print(f"   - Remaining nodes: {remaining_nodes}")
+    log.info("✅ Graph cleanup completed!")
+    log.info("   - Deleted %s relationships", deleted_rels)
+    log.info("   - Deleted %s nodes", deleted_nodes)
+    log.info("   - Remaining nodes: %s", remaining_nodes)
     
     if remaining_nodes > 0:
-        print("⚠️  Warning: Some nodes may still remain. You might need to check for system nodes.")
+        log.warning("⚠️  Some nodes may still remain. You might need to check for system nodes.")
     
     return stats
 
 
+def _label_predicate(labels):
+    """Cypher WHERE clause matching n against any of labels"""
+    return " OR ".join("n:`{}`".format(label.replace("`", "``")) for label in labels)
+
+
+def _delete_label_relationships(driver, labels, use_apoc):
+    """Delete every relationship attached to a node with one of labels, in serial batches"""
+    log.info("   Deleting relationships of labels %s...", labels)
+    match = "MATCH (n)-[r]-() WHERE " + _label_predicate(labels)
+    if use_apoc:
+        # Endpoints are shared between batches, so relationship batches run serially to avoid lock contention
+        return _periodic_delete(driver, match + " RETURN DISTINCT r", "DELETE r",
+                                parallel=False, batch_size=5000)
+    return _retry_transient(
+        driver.execute_query, match + " WITH DISTINCT r DELETE r RETURN count(r) as deleted_relationships",
+        database_=NEO4J_DATABASE, result_transformer_=_single_value
+    )
+
+
+def _delete_label(driver, label, use_apoc):
+    """DETACH DELETE every node with the given label and return how many were deleted"""
+    log.info("   Deleting nodes with label '%s'...", label)
+    match = "MATCH (n:`{}`)".format(label.replace("`", "``"))
+    
+    # 해당 라벨의 노드와 연결된 모든 관계도 함께 삭제
+    # A node can carry several of the labels being cleared, so batches run serially
+    if use_apoc:
+        deleted_count = _periodic_delete(driver, match + " RETURN n", "DETACH DELETE n",
+                                         parallel=False, batch_size=5000)
+    else:
+        deleted_count = _retry_transient(driver.execute_query, f"""
+        {match}
+        DETACH DELETE n
+        RETURN count(n) as deleted_count
+        """, database_=NEO4J_DATABASE, result_transformer_=_single_value)
+    
+    log.info("   - Deleted %s nodes with label '%s'", deleted_count, label)
+    return deleted_count
+
+
 def clear_specific_labels(labels_to_clear=None, driver=None):
     """
     특정 라벨의 노드들만 삭제하는 함수
@@ -1478,37 +2877,30 @@ def clear_specific_labels(labels_to_clear=None, driver=None):
     if labels_to_clear is None:
         labels_to_clear = ['__Entity__', '__Chunk__', '__Community__', 'Book']
     
-    print(f"🗑️  Clearing nodes with labels: {labels_to_clear}")
+    log.info("🗑️  Clearing nodes with labels: %s", labels_to_clear)
     
-    total_deleted = 0
-    
-    for label in labels_to_clear:
-        print(f"   Deleting nodes with label '{label}'...")
-        
-        # 해당 라벨의 노드와 연결된 모든 관계도 함께 삭제
-        result = driver.execute_query(f"""
-        MATCH (n:{label})
-        DETACH DELETE n
-        RETURN count(n) as deleted_count
-        """)
-        
-        deleted_count = result[0][0]["deleted_count"] if result[0] else 0
-        total_deleted += deleted_count
-        print(f"   - Deleted {deleted_count} nodes with label '{label}'")
+    use_apoc = _apoc_available(driver)
+    # Relationships first, once and serially: two labels' nodes can share a relationship
+    deleted_rels = _delete_label_relationships(driver, labels_to_clear, use_apoc) if labels_to_clear else 0
+    # Then the nodes, one label at a time: nodes with two of the labels would
+    # otherwise be locked by two concurrent deletes
+    total_deleted = sum(_delete_label(driver, label, use_apoc) for label in labels_to_clear)
+    _touch_community_version()
     
     # GDS 그래프 정리
     try:
-        driver.execute_query("CALL gds.graph.drop('entity')")
-        print("   - Cleaned up GDS 'entity' graph")
+        driver.execute_query("CALL gds.graph.drop('entity')", database_=NEO4J_DATABASE)
+        log.info("   - Cleaned up GDS 'entity' graph")
     except Exception:
         pass
     
     stats = {
         "labels_cleared": labels_to_clear,
+        "deleted_relationships": deleted_rels,
         "total_deleted_nodes": total_deleted,
         "status": "success"
     }
     
-    print(f"✅ Selective cleanup completed! Deleted {total_deleted} nodes total.")
+    log.info("✅ Selective cleanup completed! Deleted %s nodes total.", total_deleted)
     
     return stats
\ No newline at end of file
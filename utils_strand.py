@@ -1,11 +1,56 @@
 import os
+import hashlib
+import logging
+import queue
+import sqlite3
+import threading
+import time
+import boto3
+import numpy as np
 import tiktoken
-from neo4j import GraphDatabase
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectTimeoutError, ReadTimeoutError
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import lru_cache
+from neo4j import GraphDatabase, Result
 from typing import List, Union, Optional
 
+log = logging.getLogger(__name__)
+
 # Import Bedrock embedding functionality
 from embedding import BedrockEmbedding, create_embeddings
 
+# Names tools.py re-exports with "from utils_strand import *"
+__all__ = [
+    # Neo4j connection
+    'neo4j_driver',
+    'NEO4J_DATABASE',
+    
+    # Text processing utilities
+    'num_tokens_from_string',
+    'num_tokens_from_string_batch',
+    'count_tokens',
+    'chunk_text',
+    'chunk_text_by_tokens',
+    
+    # LLM functions
+    'chat',
+    'chat_bedrock',
+    'embed',
+    'embed_batch',
+    'embed_bedrock',
+    'embed_openai',
+    
+    # Connection tests
+    'test_neo4j_connection',
+    'test_all_connections',
+    
+    # Availability flags
+    'STRANDS_AVAILABLE',
+    'OPENAI_AVAILABLE',
+]
+
 # Import Strands for agent functionality
 try:
     from strands import Agent
@@ -19,33 +64,132 @@ except ImportError:
 NEO4J_URI = os.environ.get("NEO4J_URI", "bolt://localhost:7687")
 NEO4J_USERNAME = os.environ.get("NEO4J_USERNAME", "neo4j")
 NEO4J_PASSWORD = os.environ.get("NEO4J_PASSWORD", "password123")
-
+# Naming the database avoids a home-database lookup on every query
+NEO4J_DATABASE = os.environ.get("NEO4J_DATABASE", "neo4j")
+
+# Number of concurrent Neo4j users expected on top of the per-core baseline
+NEO4J_EXPECTED_CONCURRENCY = int(os.environ.get("NEO4J_EXPECTED_CONCURRENCY", "32"))
+# Pool size and how long a caller waits for a free connection can be set directly
+NEO4J_POOL_SIZE = int(os.environ.get("NEO4J_POOL_SIZE", (os.cpu_count() or 1) * 2 + NEO4J_EXPECTED_CONCURRENCY))
+NEO4J_ACQ_TIMEOUT = float(os.environ.get("NEO4J_ACQ_TIMEOUT", "60"))
+
+# The driver owns the connection pool and must be created exactly once per process:
+# it is built when this module is first imported and shared by every helper.
+# Do not construct drivers per request (e.g. inside a web handler); pass this one around.
 neo4j_driver = GraphDatabase.driver(
     NEO4J_URI,
     auth=(NEO4J_USERNAME, NEO4J_PASSWORD),
     notifications_min_severity="OFF",
     max_connection_lifetime=30 * 60,  # 30 minutes
-    max_connection_pool_size=50,
-    connection_acquisition_timeout=60  # 60 seconds
+    max_connection_pool_size=NEO4J_POOL_SIZE,
+    connection_acquisition_timeout=NEO4J_ACQ_TIMEOUT,
+    connection_timeout=10,  # 10 seconds
+    keep_alive=True,
+    liveness_check_timeout=30  # re-check connections idle for more than 30 seconds
 )
 
 # Only use Bedrock/Strands - no OpenAI
 OPENAI_AVAILABLE = False
 open_ai_client = None
 
-# Initialize Bedrock embedding client
-bedrock_embedder = BedrockEmbedding(
-    region_name=os.environ.get("AWS_DEFAULT_REGION", "ap-northeast-2")
+# Default Bedrock chat model settings
+BEDROCK_MODEL_ID = os.environ.get("BEDROCK_MODEL_ID", "apac.anthropic.claude-3-7-sonnet-20250219-v1:0")
+BEDROCK_REGION = os.environ.get("AWS_DEFAULT_REGION", "ap-northeast-2")
+BEDROCK_TEMPERATURE = 0.3
+
+# One connection-pool/retry configuration for every bedrock-runtime client we create
+BEDROCK_MAX_POOL_CONNECTIONS = int(os.environ.get("BEDROCK_MAX_POOL_CONNECTIONS", "64"))
+BEDROCK_CLIENT_CONFIG = Config(
+    max_pool_connections=BEDROCK_MAX_POOL_CONNECTIONS,
+    retries={"mode": "adaptive", "max_attempts": 10},
 )
 
+
+@lru_cache(maxsize=None)
+def _get_boto_session(region_name: str):
+    """boto3 session shared by all clients for a region (credentials are resolved once)"""
+    return boto3.Session(region_name=region_name)
+
+
+# Shared bedrock-runtime client for embeddings, with keep-alive connections across calls
+bedrock_runtime_client = _get_boto_session(BEDROCK_REGION).client(
+    "bedrock-runtime", config=BEDROCK_CLIENT_CONFIG
+)
+
+# Initialize Bedrock embedding client
+bedrock_embedder = BedrockEmbedding(region_name=BEDROCK_REGION, client=bedrock_runtime_client)
+
+# Extra chat model ids (comma-separated) whose agents are built at import time
+BEDROCK_MODEL_IDS = [
+    model_id.strip()
+    for model_id in os.environ.get("BEDROCK_MODEL_IDS", "").split(",")
+    if model_id.strip()
+]
+
+# Bedrock latency-optimized inference (only some models support it)
+BEDROCK_LATENCY_OPTIMIZED = os.environ.get("BEDROCK_LATENCY_OPTIMIZED", "0") == "1"
+
+
+def _bedrock_model_options():
+    """Extra BedrockModel arguments shared by every model we construct"""
+    if BEDROCK_LATENCY_OPTIMIZED:
+        return {"additional_args": {"performanceConfig": {"latency": "optimized"}}}
+    return {}
+
+
+@lru_cache(maxsize=16)
+def _get_model(model_id: str, region_name: str, temperature: float):
+    """Return a BedrockModel for the given settings, building it only once"""
+    # Strands builds the model's client from the shared session and pool/retry config
+    return BedrockModel(
+        model_id=model_id,
+        boto_session=_get_boto_session(region_name),
+        boto_client_config=BEDROCK_CLIENT_CONFIG,
+        temperature=temperature,
+        **_bedrock_model_options(),
+    )
+
+
+# Strands agents keep conversation state and must not be invoked concurrently,
+# so each thread gets its own agents on top of the shared (thread-safe) models
+_agent_local = threading.local()
+# Warm models keyed by (model_id, temperature); never evicted, unlike _get_model's cache
+_preloaded_models = {}
+
+
+def _get_agent(model_id: str, region_name: str, temperature: float, stream: bool = True):
+    """
+    Return this thread's Strands agent for the given model settings
+    
+    With stream=False the agent has no callback handler, so concurrent calls
+    don't interleave streamed output on stdout.
+    """
+    agents = getattr(_agent_local, "agents", None)
+    if agents is None:
+        agents = _agent_local.agents = {}
+    key = (model_id, region_name, temperature, stream)
+    agent = agents.get(key)
+    if agent is None:
+        model = _preloaded_models.get((model_id, temperature))
+        if model is None:
+            model = _get_model(model_id, region_name, temperature)
+        if stream:
+            agent = Agent(model=model)
+        else:
+            agent = Agent(model=model, callback_handler=None)
+        agents[key] = agent
+    return agent
+
+
 # Initialize Strands agent if available
 if STRANDS_AVAILABLE:
-    bedrock_model = BedrockModel(
-        model_id=os.environ.get("BEDROCK_MODEL_ID", "apac.anthropic.claude-3-7-sonnet-20250219-v1:0"),
-        region_name=os.environ.get("AWS_DEFAULT_REGION", "ap-northeast-2"),
-        temperature=0.3,
-    )
-    strands_agent = Agent(model=bedrock_model)
+    strands_agent = _get_agent(BEDROCK_MODEL_ID, BEDROCK_REGION, BEDROCK_TEMPERATURE)
+    bedrock_model = strands_agent.model
+    _preloaded_models[(BEDROCK_MODEL_ID, BEDROCK_TEMPERATURE)] = bedrock_model
+    for _model_id in BEDROCK_MODEL_IDS:
+        _preloaded_models[(_model_id, BEDROCK_TEMPERATURE)] = _get_model(
+            _model_id, BEDROCK_REGION, BEDROCK_TEMPERATURE
+        )
 else:
     strands_agent = None
 
@@ -53,9 +197,8 @@ else:
 def test_neo4j_connection():
     """Test Neo4j connection and return basic info"""
     try:
-        with neo4j_driver.session() as session:
-            result = session.run("CALL db.ping()")
-            return {"status": "connected", "message": "Neo4j connection successful"}
+        neo4j_driver.verify_connectivity()
+        return {"status": "connected", "message": "Neo4j connection successful"}
     except Exception as e:
         return {"status": "error", "message": f"Neo4j connection failed: {str(e)}"}
 
@@ -63,58 +206,276 @@ def test_neo4j_connection():
 def get_neo4j_info():
     """Get Neo4j database information"""
     try:
-        with neo4j_driver.session() as session:
-            result = session.run("CALL dbms.components() YIELD name, versions, edition")
-            info = result.single()
-            return {
-                "name": info["name"],
-                "versions": info["versions"],
-                "edition": info["edition"]
-            }
+        info = neo4j_driver.execute_query(
+            "CALL dbms.components() YIELD name, versions, edition",
+            database_=NEO4J_DATABASE,
+            result_transformer_=Result.single
+        )
+        return {
+            "name": info["name"],
+            "versions": info["versions"],
+            "edition": info["edition"]
+        }
     except Exception as e:
         return {"error": f"Failed to get Neo4j info: {str(e)}"}
 
 
 def chunk_text(text, chunk_size, overlap, split_on_whitespace_only=True):
+    if not split_on_whitespace_only:
+        # Fixed-stride windows: every boundary is known up front, so build
+        # all slices in one pass (slicing already clamps the end to len(text))
+        return [
+            text[max(0, index - overlap + 1):index + chunk_size + overlap].strip()
+            for index in range(0, len(text), chunk_size)
+        ]
+
     chunks = []
     index = 0
 
     while index < len(text):
-        if split_on_whitespace_only:
+        # Last space at or before index - overlap (str.rfind runs in C)
+        left_index = index - overlap
+        prev_whitespace = text.rfind(" ", 0, left_index + 1) if left_index >= 0 else -1
+        if prev_whitespace == -1:
             prev_whitespace = 0
-            left_index = index - overlap
-            while left_index >= 0:
-                if text[left_index] == " ":
-                    prev_whitespace = left_index
-                    break
-                left_index -= 1
-            next_whitespace = text.find(" ", index + chunk_size)
-            if next_whitespace == -1:
-                next_whitespace = len(text)
-            chunk = text[prev_whitespace:next_whitespace].strip()
-            chunks.append(chunk)
-            index = next_whitespace + 1
-        else:
-            start = max(0, index - overlap + 1)
-            end = min(index + chunk_size + overlap, len(text))
-            chunk = text[start:end].strip()
-            chunks.append(chunk)
-            index += chunk_size
+        # First space at or after index + chunk_size
+        next_whitespace = text.find(" ", index + chunk_size)
+        if next_whitespace == -1:
+            next_whitespace = len(text)
+        chunk = text[prev_whitespace:next_whitespace].strip()
+        chunks.append(chunk)
+        index = next_whitespace + 1
+
+    return chunks
+
+
+def chunk_text_by_tokens(text, chunk_size, stride=None, model="gpt-4"):
+    """
+    Split text into windows of chunk_size tokens, starting a new window every stride tokens
+    
+    The text is tokenized once and each window is cut from the UTF-8 bytes of
+    its tokens. A window edge that falls inside a multibyte character (common
+    for Korean text) is moved back to the character boundary, so the partial
+    bytes go to the next window instead of being decoded as U+FFFD.
+    
+    Args:
+        text: Text to split
+        chunk_size: Maximum number of tokens per chunk
+        stride: Tokens between window starts (defaults to 75% of chunk_size)
+        model: Model whose tokenizer is used
+    
+    Returns:
+        List of chunk strings
+    """
+    if stride is None:
+        stride = max(1, int(0.75 * chunk_size))
+    if chunk_size <= 0 or stride <= 0:
+        raise ValueError("chunk_size and stride must be positive")
+
+    encoding = _get_encoding(model)
+    tokens = encoding.encode_ordinary(text)
+    data = text.encode("utf-8")
+
+    # Byte offset of every token boundary
+    offsets = [0]
+    for token_bytes in encoding.decode_tokens_bytes(tokens):
+        offsets.append(offsets[-1] + len(token_bytes))
+
+    def char_boundary(pos):
+        # Step back over UTF-8 continuation bytes (0b10xxxxxx)
+        while 0 < pos < len(data) and data[pos] & 0xC0 == 0x80:
+            pos -= 1
+        return pos
 
+    chunks = []
+    for start in range(0, len(tokens), stride):
+        end = min(start + chunk_size, len(tokens))
+        chunk = data[char_boundary(offsets[start]):char_boundary(offsets[end])].decode("utf-8")
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(tokens):
+            break
     return chunks
 
 
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    """Return the tiktoken encoding for a model, loading its BPE table only once"""
+    return tiktoken.encoding_for_model(model)
+
+
+# Strings longer than this are tokenized in slices when only a count is needed
+TOKEN_COUNT_SLICE_SIZE = 64 * 1024
+
+# Token counts keyed by (content digest, model) so repeated texts are not re-tokenized
+TOKEN_COUNT_CACHE_SIZE = 4096
+_token_count_cache = OrderedDict()
+_token_count_cache_lock = threading.Lock()
+
+
 def num_tokens_from_string(string: str, model: str = "gpt-4") -> int:
-    """Returns the number of tokens in a text string."""
-    encoding = tiktoken.encoding_for_model(model)
-    num_tokens = len(encoding.encode(string))
+    """Returns the number of tokens in a text string (cached count_tokens)."""
+    key = (hashlib.blake2b(string.encode("utf-8"), digest_size=16).digest(), model)
+    with _token_count_cache_lock:
+        num_tokens = _token_count_cache.get(key)
+        if num_tokens is not None:
+            _token_count_cache.move_to_end(key)
+            return num_tokens
+
+    num_tokens = count_tokens(string, model)
+
+    with _token_count_cache_lock:
+        _token_count_cache[key] = num_tokens
+        if len(_token_count_cache) > TOKEN_COUNT_CACHE_SIZE:
+            _token_count_cache.popitem(last=False)
+    return num_tokens
+
+
+def num_tokens_from_string_batch(strings: List[str], model: str = "gpt-4",
+                                 num_threads: Optional[int] = None) -> List[int]:
+    """
+    Returns the number of tokens in each of many text strings
+    
+    Texts not already in the token count cache are tokenized together with
+    encode_ordinary_batch, which releases the GIL and spreads the work over
+    num_threads threads (default: one per CPU).
+    """
+    keys = [(hashlib.blake2b(string.encode("utf-8"), digest_size=16).digest(), model) for string in strings]
+    counts = [None] * len(strings)
+    with _token_count_cache_lock:
+        for i, key in enumerate(keys):
+            num_tokens = _token_count_cache.get(key)
+            if num_tokens is not None:
+                _token_count_cache.move_to_end(key)
+                counts[i] = num_tokens
+
+    misses = [i for i, num_tokens in enumerate(counts) if num_tokens is None]
+    if misses:
+        encoded = _get_encoding(model).encode_ordinary_batch(
+            [strings[i] for i in misses], num_threads=num_threads or os.cpu_count() or 1
+        )
+        with _token_count_cache_lock:
+            for i, tokens in zip(misses, encoded):
+                counts[i] = len(tokens)
+                _token_count_cache[keys[i]] = counts[i]
+            while len(_token_count_cache) > TOKEN_COUNT_CACHE_SIZE:
+                _token_count_cache.popitem(last=False)
+    return counts
+
+
+def count_tokens(string: str, model: str = "gpt-4") -> int:
+    """
+    Return the number of tokens in a string without keeping its token ids
+    
+    Strings longer than TOKEN_COUNT_SLICE_SIZE characters are encoded in
+    bounded slices and only their lengths are kept; the total equals
+    len(encoding.encode_ordinary(string)). Special-token text such as
+    "<|endoftext|>" is counted as ordinary text rather than raising, as
+    encoding.encode() would. Results are not cached, see
+    num_tokens_from_string.
+    """
+    encoding = _get_encoding(model)
+    length = len(string)
+    if length <= TOKEN_COUNT_SLICE_SIZE:
+        return len(encoding.encode_ordinary(string))
+
+    # Slices are cut right before a space that follows a non-space character.
+    # tiktoken's pre-tokenizer always starts a new piece there (no piece runs
+    # from a non-space character into a space) and BPE never merges across
+    # pieces, so the slice counts add up to the whole-string count.
+    num_tokens = 0
+    start = 0
+    while start < length:
+        end = start + TOKEN_COUNT_SLICE_SIZE
+        if end < length:
+            cut = _token_slice_cut(string, start, end)
+            end = cut if cut != -1 else length
+        else:
+            end = length
+        num_tokens += len(encoding.encode_ordinary(string[start:end]))
+        start = end
     return num_tokens
 
 
+def _token_slice_cut(string, start, end):
+    """Last safe cut for count_tokens in (start, end], else the first one after end, else -1"""
+    cut = string.rfind(" ", start + 1, end + 1)
+    while cut != -1 and string[cut - 1].isspace():
+        cut = string.rfind(" ", start + 1, cut)
+    if cut != -1:
+        return cut
+    cut = string.find(" ", end)
+    while cut != -1 and string[cut - 1].isspace():
+        cut = string.find(" ", cut + 1)
+    return cut
+
+
+class _EmbedBatcher:
+    """Coalesce embedding requests from many callers into batched Bedrock calls"""
+    
+    def __init__(self, embedder: BedrockEmbedding, max_batch_size: int = 64, max_wait: float = 0.02):
+        self.embedder = embedder
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    def submit(self, text: str, dimensions: int = 1024, normalize: bool = True) -> Future:
+        """Queue a text for embedding and return a Future for its vector"""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                    self._thread.start()
+        
+        future = Future()
+        self._queue.put((text, dimensions, normalize, future))
+        return future
+    
+    def _run(self):
+        while True:
+            # Block for the first request, then collect more until the batch
+            # is full or the batching window has passed
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            # Requests with different options cannot share a Bedrock call
+            groups = {}
+            for text, dimensions, normalize, future in batch:
+                groups.setdefault((dimensions, normalize), []).append((text, future))
+            
+            for (dimensions, normalize), items in groups.items():
+                try:
+                    embeddings = self.embedder.embed_text(
+                        [text for text, _ in items], dimensions=dimensions, normalize=normalize
+                    )
+                except Exception as e:
+                    for _, future in items:
+                        future.set_exception(e)
+                    continue
+                for (_, future), embedding in zip(items, embeddings):
+                    future.set_result(embedding)
+
+
+_embed_batcher = _EmbedBatcher(bedrock_embedder)
+
+
 def embed(texts: Union[str, List[str]], **kwargs) -> List[List[float]]:
     """
     Create embeddings using Bedrock Titan
     
+    Requests are coalesced with those of concurrent callers before being
+    sent to Bedrock.
+    
     Args:
         texts: Text or list of texts to embed
         **kwargs: Additional arguments for embedding models (dimensions, normalize)
@@ -123,7 +484,55 @@ def embed(texts: Union[str, List[str]], **kwargs) -> List[List[float]]:
         List of embedding vectors
     """
     # Always use Bedrock Titan embedding
-    return bedrock_embedder.embed_text(texts, **kwargs)
+    if isinstance(texts, str):
+        return _embed_batcher.submit(texts, **kwargs).result()
+    
+    futures = [_embed_batcher.submit(text, **kwargs) for text in texts]
+    return [future.result() for future in futures]
+
+
+# Texts sent to the embedder per embed_batch call, halved on errors
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "32"))
+
+
+def embed_batch(texts: List[str], dimensions: int = 1024, normalize: bool = True,
+                batch_size: Optional[int] = None) -> List[List[float]]:
+    """
+    Embed a whole list of texts, batch_size texts per call
+    
+    Titan has no multi-input endpoint, so each batch is fanned out over the
+    embedder's thread pool at once instead of waiting in the batching window
+    used by embed(). When a batch fails with a service error or timeout, the
+    batch size is halved and the batch retried; at size 1 a service error
+    gives a zero vector, as in embed_bedrock(), and a timeout is raised.
+    
+    Args:
+        texts: Texts to embed
+        dimensions: Output dimensions (256, 512, or 1024)
+        normalize: Whether to normalize embeddings
+        batch_size: Initial texts per call (default EMBED_BATCH_SIZE)
+    
+    Returns:
+        List of embedding vectors, in input order
+    """
+    texts = list(texts)
+    size = max(1, batch_size or EMBED_BATCH_SIZE)
+    embeddings = []
+    i = 0
+    while i < len(texts):
+        batch = texts[i:i + size]
+        try:
+            embeddings.extend(bedrock_embedder.embed_text(
+                batch, dimensions=dimensions, normalize=normalize, raise_errors=size > 1
+            ))
+        except (ClientError, ConnectTimeoutError, ReadTimeoutError) as e:
+            if size == 1:
+                raise
+            size //= 2
+            log.warning("Embedding batch failed (%s); retrying with batch size %d", e, size)
+            continue
+        i += len(batch)
+    return embeddings
 
 
 def embed_bedrock(texts: Union[str, List[str]], dimensions: int = 1024, normalize: bool = True) -> List[List[float]]:
@@ -148,7 +557,8 @@ def embed_openai(texts: Union[str, List[str]], model: str = "text-embedding-3-sm
     raise RuntimeError("OpenAI functionality is disabled. Use embed_bedrock() or embed() instead.")
 
 
-def chat(messages, model: Optional[str] = None, model_id: Optional[str] = None, temperature: float = 0.3, **kwargs) -> str:
+def chat(messages, model: Optional[str] = None, model_id: Optional[str] = None, temperature: float = 0.3,
+         cache_bypass: bool = False, stateless: bool = False, stream: bool = True, **kwargs) -> str:
     """
     Chat using Bedrock models via Strands (Bedrock-only)
     
@@ -157,6 +567,9 @@ def chat(messages, model: Optional[str] = None, model_id: Optional[str] = None,
         model: Model name (ignored, always uses Bedrock)
         model_id: Bedrock model ID (optional, uses default)
         temperature: Model temperature
+        cache_bypass: Always call the model, ignoring the response cache
+        stateless: Send the prompt without earlier turns (see chat_bedrock)
+        stream: Print the response as it streams in
         **kwargs: Additional arguments (ignored)
     
     Returns:
@@ -169,18 +582,36 @@ def chat(messages, model: Optional[str] = None, model_id: Optional[str] = None,
     if model and model.startswith("gpt"):
         print(f"⚠️  Model '{model}' requested but using Bedrock instead (OpenAI disabled)")
     
-    # Handle both message formats
-    if isinstance(messages, list) and len(messages) > 0:
-        # Extract content from message list
-        if isinstance(messages[0], dict) and "content" in messages[0]:
-            message = messages[0]["content"]
-        else:
-            message = str(messages[0])
-    else:
-        message = str(messages)
+    message = _coerce_message(messages)
     
     # Always use Bedrock
-    return chat_bedrock(message, model_id, temperature)
+    return chat_bedrock(message, model_id, temperature, cache_bypass=cache_bypass,
+                        stateless=stateless, stream=stream)
+
+
+def _coerce_message(messages) -> str:
+    """
+    Turn chat input into the single prompt string sent to the agent
+    
+    A string is used as is and a single message contributes only its content.
+    Several messages are all kept, each prefixed with its role, so that e.g.
+    a system prompt followed by a user question reaches the model in full.
+    """
+    if isinstance(messages, str):
+        return messages
+    if isinstance(messages, dict):
+        return str(messages.get("content", messages))
+    if isinstance(messages, (list, tuple)):
+        if len(messages) == 1:
+            return _coerce_message(messages[0])
+        parts = []
+        for item in messages:
+            if isinstance(item, dict) and "content" in item:
+                parts.append(f"{item.get('role', 'user')}:\n{item['content']}")
+            else:
+                parts.append(str(item))
+        return "\n\n".join(parts)
+    return str(messages)
 
 
 
@@ -191,14 +622,63 @@ def tool_choice(messages, model="gpt-4o", temperature=0, tools=[], config={}):
     raise RuntimeError("OpenAI functionality is disabled. Use Strands/Bedrock alternatives instead.")
 
 
-def chat_bedrock(message: str, model_id: Optional[str] = None, temperature: float = 0.3) -> str:
+# Exact-match cache of chat responses, keyed by model, temperature and prompt.
+# Opt-in: set CHAT_CACHE_PATH to an SQLite file (e.g. chat_cache.sqlite3) to
+# enable it; empty (the default) disables it.
+CHAT_CACHE_PATH = os.environ.get("CHAT_CACHE_PATH", "")
+
+
+class _ResponseCache:
+    """SQLite table mapping a prompt hash to the model's response text"""
+    
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS responses (hash TEXT PRIMARY KEY, response TEXT)")
+        self._conn.commit()
+    
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE hash = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+    
+    def put(self, key, response):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?)", (key, response))
+            self._conn.commit()
+
+
+_chat_cache = None
+_chat_cache_lock = threading.Lock()
+
+
+def _get_chat_cache():
+    global _chat_cache
+    if not CHAT_CACHE_PATH:
+        return None
+    with _chat_cache_lock:
+        if _chat_cache is None:
+            _chat_cache = _ResponseCache(CHAT_CACHE_PATH)
+        return _chat_cache
+
+
+def chat_bedrock(message: str, model_id: Optional[str] = None, temperature: float = BEDROCK_TEMPERATURE,
+                 cache_bypass: bool = False, stateless: bool = False, stream: bool = True) -> str:
     """
     Chat using Bedrock model via Strands
     
+    By default the thread's agent keeps the conversation history, so each call
+    continues the previous ones. With stateless=True the history is cleared
+    first and the response depends on the prompt alone; only such calls use
+    the response cache.
+    
     Args:
         message: Input message
         model_id: Bedrock model ID (optional, uses default)
         temperature: Model temperature
+        cache_bypass: Always call the model, ignoring the response cache
+        stateless: Send the prompt without earlier turns
+        stream: Print the response as it streams in (Strands' default callback handler)
     
     Returns:
         Model response as string
@@ -206,30 +686,41 @@ def chat_bedrock(message: str, model_id: Optional[str] = None, temperature: floa
     if not STRANDS_AVAILABLE:
         raise RuntimeError("Strands is not available. Please install it to use Bedrock chat.")
     
-    if model_id and model_id != bedrock_model.model_id:
-        # Create new model with different ID
-        temp_model = BedrockModel(
-            model_id=model_id,
-            region_name=bedrock_model.region_name,
-            temperature=temperature,
-        )
-        temp_agent = Agent(model=temp_model)
-        result = temp_agent(message)
-    else:
-        result = strands_agent(message)
+    model_id = model_id or BEDROCK_MODEL_ID
+    # A reply that depends on earlier turns is not a function of the prompt alone
+    cache = None if cache_bypass or not stateless else _get_chat_cache()
+    if cache is not None:
+        key = hashlib.sha256(f"{model_id}\0{temperature}\0{message}".encode("utf-8")).hexdigest()
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    
+    agent = _get_agent(model_id, BEDROCK_REGION, temperature, stream)
+    if stateless:
+        agent.messages.clear()
+    result = agent(message)
     
     # Extract text from AgentResult if needed
     if hasattr(result, 'text'):
-        return result.text
+        response = result.text
     elif hasattr(result, 'content'):
-        return result.content
+        response = result.content
     elif hasattr(result, '__str__'):
-        return str(result)
+        response = str(result)
     else:
-        return result
+        response = result
+    
+    if cache is not None and isinstance(response, str):
+        cache.put(key, response)
+    return response
+
 
+def _cosine(a: np.ndarray, b: np.ndarray) -> float:
+    """Cosine similarity of two vectors"""
+    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
 
-def compare_embeddings(text1: str, text2: str, method: str = "bedrock") -> dict:
+
+def compare_embeddings(text1: str, text2: str, method: str = "bedrock", dtype=np.float32) -> dict:
     """
     Compare two texts using embeddings and calculate similarity
     
@@ -237,25 +728,27 @@ def compare_embeddings(text1: str, text2: str, method: str = "bedrock") -> dict:
         text1: First text
         text2: Second text
         method: "bedrock" or "openai"
+        dtype: NumPy dtype used for the similarity computation
     
     Returns:
         Dictionary with embeddings and similarity score
     """
-    import numpy as np
-    
     # Get embeddings
     if method == "bedrock":
-        emb1 = embed_bedrock(text1)
-        emb2 = embed_bedrock(text2)
+        # One call for both texts; Titan returns unit vectors with normalize=True
+        emb1, emb2 = embed_bedrock([text1, text2], normalize=True)
     else:
-        emb1 = embed_openai(text1)
-        emb2 = embed_openai(text2)
+        emb1, emb2 = embed_openai([text1, text2])
     
     # Calculate cosine similarity
-    emb1_np = np.array(emb1)
-    emb2_np = np.array(emb2)
+    emb1_np = np.asarray(emb1, dtype=dtype)
+    emb2_np = np.asarray(emb2, dtype=dtype)
     
-    similarity = np.dot(emb1_np, emb2_np) / (np.linalg.norm(emb1_np) * np.linalg.norm(emb2_np))
+    if method == "bedrock":
+        # Vectors are already normalized, so cosine similarity is the dot product
+        similarity = np.dot(emb1_np, emb2_np)
+    else:
+        similarity = _cosine(emb1_np, emb2_np)
     
     return {
         "text1": text1,
@@ -267,6 +760,50 @@ def compare_embeddings(text1: str, text2: str, method: str = "bedrock") -> dict:
     }
 
 
+def compare_embeddings_batch(texts_a: List[str], texts_b: List[str], dtype=np.float32) -> np.ndarray:
+    """
+    Compare every text in texts_a with every text in texts_b using Bedrock embeddings
+    
+    Args:
+        texts_a: First list of texts
+        texts_b: Second list of texts
+        dtype: NumPy dtype of the stacked embeddings (e.g. np.float16, ml_dtypes.bfloat16)
+    
+    Returns:
+        Array of shape (len(texts_a), len(texts_b)) with cosine similarities
+    """
+    texts_a = list(texts_a)
+    embeddings = embed_bedrock(texts_a + list(texts_b), normalize=True)
+    
+    # Normalized vectors: one matrix product gives all cosine similarities
+    matrix = np.asarray(embeddings, dtype=dtype)
+    emb_a = matrix[:len(texts_a)]
+    emb_b = matrix[len(texts_a):]
+    return emb_a @ emb_b.T
+
+
+# Seconds a successful agent probe response is reused for
+AGENT_PROBE_TTL = 60
+# Only the last probe is kept: (prompt, expiry time, response)
+_agent_probe_last = None
+_agent_probe_lock = threading.Lock()
+
+
+def _probe_agent(prompt: str) -> str:
+    """Send a probe prompt to the default agent, reusing a recent successful response"""
+    global _agent_probe_last
+    with _agent_probe_lock:
+        last = _agent_probe_last
+    if last is not None and last[0] == prompt and last[1] > time.monotonic():
+        return last[2]
+    
+    # A probe must reach the model, so it never answers from the response cache
+    response = chat_bedrock(prompt, cache_bypass=True, stateless=True, stream=False)
+    with _agent_probe_lock:
+        _agent_probe_last = (prompt, time.monotonic() + AGENT_PROBE_TTL, response)
+    return response
+
+
 def test_all_connections():
     """Test all available connections and services"""
     results = {}
@@ -290,7 +827,7 @@ def test_all_connections():
     # Test Strands agent
     if STRANDS_AVAILABLE:
         try:
-            test_response = strands_agent("Hello")
+            test_response = _probe_agent("Hello")
             results["strands_agent"] = {
                 "status": "connected",
                 "message": f"Strands agent successful, response length: {len(test_response)}"